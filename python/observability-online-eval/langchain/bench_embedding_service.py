@@ -0,0 +1,96 @@
+"""
+Embedding calls and latency of retrieve_docs' query embedding, before and after.
+
+A fake embedder sleeps for a fixed round trip plus a small per-text cost and
+returns deterministic vectors. Worker threads, like Flask's threaded server,
+send queries drawn with repeats from a fixed pool, first straight to
+``embed_query`` and then through EmbeddingService. The service's vectors are
+checked against the direct ones.
+
+    python bench_embedding_service.py --requests 2000 --threads 32
+"""
+import argparse
+import hashlib
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from embedding_service import EmbeddingService
+
+
+class FakeEmbeddings:
+    def __init__(self, round_trip: float, per_text: float) -> None:
+        self.round_trip = round_trip
+        self.per_text = per_text
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _vector(self, text: str) -> List[float]:
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return [b / 255 for b in digest]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.round_trip + self.per_text * len(texts))
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def run(name: str, embed, queries: List[str], threads: int, calls) -> None:
+    latencies = []
+
+    def one(query: str):
+        start = time.perf_counter()
+        vector = embed(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        return vector
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        vectors = list(pool.map(one, queries))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<8} {len(queries) / elapsed:8.1f} req/s  "
+        f"p50={statistics.median(latencies):7.2f} ms  p99={percentile(latencies, 0.99):7.2f} ms  "
+        f"embedding calls={calls()}"
+    )
+    return vectors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--distinct", type=int, default=300)
+    parser.add_argument("--round-trip", type=float, default=0.05)
+    parser.add_argument("--per-text", type=float, default=0.0002)
+    parser.add_argument("--batch-window", type=float, default=0.005)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pool = [f"movies about topic {i}" for i in range(args.distinct)]
+    queries = [rng.choice(pool) for _ in range(args.requests)]
+
+    direct = FakeEmbeddings(args.round_trip, args.per_text)
+    expected = run("direct", direct.embed_query, queries, args.threads, lambda: direct.calls)
+
+    fake = FakeEmbeddings(args.round_trip, args.per_text)
+    service = EmbeddingService(fake, batch_window=args.batch_window)
+    vectors = run("service", service.embed_query, queries, args.threads, lambda: fake.calls)
+    assert vectors == expected, "service vectors differ from direct embeddings"
+    print(service.stats())
+
+
+if __name__ == "__main__":
+    main()
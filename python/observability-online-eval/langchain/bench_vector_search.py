@@ -0,0 +1,124 @@
+"""
+Recall and latency of the $vectorSearch settings, on a local stand-in.
+
+Atlas answers $vectorSearch from an approximate index, considering
+``numCandidates`` neighbours and returning the best ``limit``. This benchmark
+mimics that locally with an IVF-style numpy index over synthetic clustered
+embeddings: clusters are probed nearest first until ``numCandidates`` vectors
+are gathered, which are then ranked exactly. It reports recall@limit against
+a brute-force search, latency per query, and the bytes returned per query
+with and without the pipeline's $project stage (full documents carry the
+embedding).
+
+    python bench_vector_search.py --docs 20000 --dim 1536 --queries 200
+"""
+import argparse
+import json
+import statistics
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from mongo_retrieval import PROJECTION
+
+
+class IVFIndex:
+    def __init__(self, vectors: np.ndarray, lists: int, iterations: int = 5, seed: int = 0) -> None:
+        rng = np.random.default_rng(seed)
+        self.vectors = vectors
+        self.centroids = vectors[rng.choice(len(vectors), lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(vectors @ self.centroids.T, axis=1)
+            for c in range(lists):
+                members = vectors[assignment == c]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    self.centroids[c] = centroid / np.linalg.norm(centroid)
+        assignment = np.argmax(vectors @ self.centroids.T, axis=1)
+        self.lists = [np.flatnonzero(assignment == c) for c in range(lists)]
+
+    def search(self, query: np.ndarray, num_candidates: int, limit: int) -> np.ndarray:
+        order = np.argsort(-(self.centroids @ query))
+        candidates: List[np.ndarray] = []
+        gathered = 0
+        for c in order:
+            candidates.append(self.lists[c])
+            gathered += len(self.lists[c])
+            if gathered >= num_candidates:
+                break
+        ids = np.concatenate(candidates)
+        scores = self.vectors[ids] @ query
+        # Like numCandidates, only the best candidates are ranked.
+        keep = np.argsort(-scores)[:num_candidates]
+        return ids[keep[:limit]]
+
+
+def dataset(docs: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    vectors = centers[rng.integers(0, clusters, docs)] + 0.6 * rng.standard_normal((docs, dim))
+    vectors = vectors.astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def payload_bytes(dim: int) -> Tuple[int, int]:
+    """Approximate JSON size of one full and one projected movie document."""
+    full = {
+        "_id": "573a1390f29313caabcd42e8",
+        "title": "The Great Train Robbery",
+        "plot": "A group of bandits stage a brazen train hold-up. " * 4,
+        "fullplot": "Among the earliest existing films in American cinema. " * 20,
+        "year": 1903,
+        "genres": ["Short", "Western"],
+        "cast": ["A.C. Abadie", "Gilbert M. 'Broncho Billy' Anderson"],
+        "plot_embedding": [0.0123456789] * dim,
+    }
+    projected = {k: full[k] for k, v in PROJECTION.items() if v == 1}
+    projected["score"] = 0.9123456789
+    return len(json.dumps(full)), len(json.dumps(projected))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[10, 20, 50, 100, 200, 500, 1000])
+    args = parser.parse_args()
+
+    vectors = dataset(args.docs, args.dim, clusters=max(8, args.docs // 500))
+    index = IVFIndex(vectors, lists=int(np.sqrt(args.docs)))
+    # Queries land near stored plots, like questions about existing movies.
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, args.docs, args.queries)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    exact = [set(np.argsort(-(vectors @ q))[: args.limit]) for q in queries]
+
+    full, projected = payload_bytes(args.dim)
+    print(
+        f"payload per query (limit={args.limit}): full {full * args.limit / 1024:.1f} KiB, "
+        f"projected {projected * args.limit / 1024:.1f} KiB"
+    )
+    print(f"{'numCandidates':>13} {'recall@' + str(args.limit):>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for num_candidates in args.candidates:
+        if num_candidates < args.limit:
+            continue
+        recalls, latencies = [], []
+        for q, truth in zip(queries, exact):
+            start = time.perf_counter()
+            found = index.search(q, num_candidates, args.limit)
+            latencies.append((time.perf_counter() - start) * 1000)
+            recalls.append(len(truth.intersection(found)) / args.limit)
+        latencies.sort()
+        print(
+            f"{num_candidates:>13} {statistics.mean(recalls):>10.3f} "
+            f"{statistics.median(latencies):>8.3f} "
+            f"{latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import json
+import re
+from typing import Any, Dict, List, Set, Tuple
+
+import tiktoken
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"[a-z0-9']+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have he her his i in is it its me movie "
+    "movies of on or recommend she some that the their them they this to was what "
+    "where which who with you".split()
+)
+
+
+def terms(text: str) -> Set[str]:
+    return {w for w in _WORD.findall(text.lower()) if w not in STOPWORDS}
+
+
+class ContextPacker:
+    """
+    Shrinks the retrieved movies to the parts of their plots that matter for
+    the question, within a token budget.
+
+    Each plot is reduced to its ``max_sentences`` sentences sharing the most
+    terms with the question, kept in their original order (the first sentence
+    wins ties, as it usually introduces the movie). Movies are added in
+    retrieval order until the next one no longer fits in ``budget`` tokens;
+    the last one is truncated to the remaining budget when that still leaves
+    room for some of its plot. The top hit is always included, truncated as
+    far as needed.
+
+    Args:
+        budget: Maximum tokens of the JSON context.
+        max_sentences: Sentences kept per plot.
+        model: Model whose tokenizer is used for counting.
+    """
+
+    def __init__(self, budget: int = 600, max_sentences: int = 3, model: str = "gpt-4o-mini") -> None:
+        try:
+            self.encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            self.encoding = tiktoken.get_encoding("cl100k_base")
+        self.budget = budget
+        self.max_sentences = max_sentences
+
+    def count(self, context: Any) -> int:
+        return len(self.encoding.encode(json.dumps(context)))
+
+    def extract(self, query_terms: Set[str], plot: str) -> str:
+        sentences = _SENTENCE.split(plot.strip())
+        if len(sentences) <= self.max_sentences:
+            return plot
+        ranked = sorted(
+            range(len(sentences)),
+            key=lambda i: (-len(query_terms & terms(sentences[i])), i),
+        )
+        keep = sorted(ranked[: self.max_sentences])
+        return " ".join(sentences[i] for i in keep)
+
+    def pack(self, query: str, docs: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        """Return the packed context and its token counts before and after."""
+        query_terms = terms(query)
+        packed: List[Dict[str, Any]] = []
+        used = 2  # the enclosing brackets
+        for doc in docs:
+            entry = {
+                "Title": doc.get("Title", "N/A"),
+                "Year": doc.get("Year", "N/A"),
+                "Plot": self.extract(query_terms, str(doc.get("Plot", ""))),
+            }
+            tokens = self.count(entry) + 1  # separator
+            if used + tokens > self.budget:
+                plot = self.encoding.encode(entry["Plot"])
+                keep = self.budget - used - (tokens - len(plot))
+                # JSON escaping can add a few tokens, so shrink until it fits.
+                while keep >= 16:
+                    entry["Plot"] = self.encoding.decode(plot[:keep])
+                    if used + self.count(entry) + 1 <= self.budget:
+                        packed.append(entry)
+                        break
+                    keep -= 8
+                if not packed:
+                    # The top hit is always sent, cut down to its title and
+                    # year if need be: an empty context answers nothing.
+                    entry["Plot"] = self.encoding.decode(plot[: max(keep, 0)])
+                    while keep > 0 and used + self.count(entry) + 1 > self.budget:
+                        keep -= 1
+                        entry["Plot"] = self.encoding.decode(plot[:keep])
+                    packed.append(entry)
+                break
+            packed.append(entry)
+            used += tokens
+        return packed, {"tokens_before": self.count(docs), "tokens_after": self.count(packed)}
@@ -0,0 +1,208 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+
+class _Batch:
+    __slots__ = ("futures", "full")
+
+    def __init__(self) -> None:
+        self.futures: "OrderedDict[str, Future]" = OrderedDict()
+        self.full = threading.Event()
+
+
+class _AsyncBatch:
+    __slots__ = ("futures", "full")
+
+    def __init__(self) -> None:
+        self.futures: "OrderedDict[str, asyncio.Future]" = OrderedDict()
+        self.full = asyncio.Event()
+
+
+class EmbeddingService:
+    """
+    Query embeddings with an LRU+TTL cache and micro-batching.
+
+    A cache miss joins the open batch. The first request of a batch is its
+    leader: it waits up to ``batch_window`` seconds (or until ``max_batch``
+    texts have joined) and then embeds every text of the batch with a single
+    ``embed_documents`` call, so concurrent requests share one round trip.
+    Identical texts in the same batch are embedded once.
+
+    ``aembed_query`` is the same for async servers, with one event loop: its
+    batches are embedded by a task of their own with ``aembed_documents``, so
+    a caller that times out or is cancelled never strands the others.
+
+    Args:
+        embeddings: LangChain embeddings, e.g. ``OpenAIEmbeddings``.
+        maxsize: Maximum number of cached vectors.
+        ttl: Lifetime of a cached vector in seconds.
+        batch_window: Seconds the leader waits for other requests to join.
+        max_batch: Texts per ``embed_documents`` call.
+    """
+
+    def __init__(
+        self,
+        embeddings: Any,
+        maxsize: int = 2048,
+        ttl: float = 3600,
+        batch_window: float = 0.005,
+        max_batch: int = 64,
+    ) -> None:
+        self.embeddings = embeddings
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.batched_texts = 0
+        self.embed_seconds = 0.0
+        self.request_seconds = 0.0
+        self.requests = 0
+        self._cache: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._open: Optional[_Batch] = None
+        self._open_async: Optional[_AsyncBatch] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+
+    def _cached(self, text: str) -> Optional[List[float]]:
+        entry = self._cache.get(text)
+        if entry is None:
+            return None
+        expires_at, vector = entry
+        if expires_at < time.monotonic():
+            del self._cache[text]
+            return None
+        self._cache.move_to_end(text)
+        return vector
+
+    def _store(self, vectors: Dict[str, List[float]]) -> None:
+        expires_at = time.monotonic() + self.ttl
+        for text, vector in vectors.items():
+            self._cache[text] = (expires_at, vector)
+            self._cache.move_to_end(text)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def embed_query(self, text: str) -> List[float]:
+        start = time.perf_counter()
+        with self._lock:
+            vector = self._cached(text)
+            if vector is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                batch = self._open
+                leader = batch is None
+                if leader:
+                    batch = self._open = _Batch()
+                future = batch.futures.get(text)
+                if future is None:
+                    future = batch.futures[text] = Future()
+                if len(batch.futures) >= self.max_batch:
+                    self._open = None
+                    batch.full.set()
+        if vector is None:
+            if leader:
+                self._run(batch)
+            vector = future.result()
+        with self._lock:
+            self.requests += 1
+            self.request_seconds += time.perf_counter() - start
+        return vector
+
+    def _run(self, batch: _Batch) -> None:
+        batch.full.wait(self.batch_window)
+        with self._lock:
+            if self._open is batch:
+                self._open = None
+        texts = list(batch.futures)
+        start = time.perf_counter()
+        try:
+            vectors = self.embeddings.embed_documents(texts)
+        except Exception as e:
+            for future in batch.futures.values():
+                future.set_exception(e)
+            return
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.batches += 1
+            self.batched_texts += len(texts)
+            self.embed_seconds += elapsed
+            self._store(dict(zip(texts, vectors)))
+        for text, vector in zip(texts, vectors):
+            batch.futures[text].set_result(vector)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        start = time.perf_counter()
+        with self._lock:
+            vector = self._cached(text)
+            if vector is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                batch = self._open_async
+                if batch is None:
+                    batch = self._open_async = _AsyncBatch()
+                    task = asyncio.ensure_future(self._arun(batch))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                future = batch.futures.get(text)
+                if future is None:
+                    future = batch.futures[text] = asyncio.get_running_loop().create_future()
+                if len(batch.futures) >= self.max_batch:
+                    self._open_async = None
+                    batch.full.set()
+        if vector is None:
+            # Shielded so that cancelling this caller leaves the shared future alone.
+            vector = await asyncio.shield(future)
+        with self._lock:
+            self.requests += 1
+            self.request_seconds += time.perf_counter() - start
+        return vector
+
+    async def _arun(self, batch: _AsyncBatch) -> None:
+        try:
+            await asyncio.wait_for(batch.full.wait(), self.batch_window)
+        except asyncio.TimeoutError:
+            pass
+        with self._lock:
+            if self._open_async is batch:
+                self._open_async = None
+        texts = list(batch.futures)
+        start = time.perf_counter()
+        try:
+            vectors = await self.embeddings.aembed_documents(texts)
+        except Exception as e:
+            for future in batch.futures.values():
+                future.set_exception(e)
+            return
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.batches += 1
+            self.batched_texts += len(texts)
+            self.embed_seconds += elapsed
+            self._store(dict(zip(texts, vectors)))
+        for text, vector in zip(texts, vectors):
+            batch.futures[text].set_result(vector)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._cache),
+                "batches": self.batches,
+                "avg_batch_size": self.batched_texts / self.batches if self.batches else 0.0,
+                "avg_embed_ms": self.embed_seconds / self.batches * 1000 if self.batches else 0.0,
+                "avg_request_ms": self.request_seconds / self.requests * 1000
+                if self.requests
+                else 0.0,
+            }
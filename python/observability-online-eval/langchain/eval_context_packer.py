@@ -0,0 +1,199 @@
+"""
+Tokens saved by ContextPacker and answer quality on a fixed evaluation set.
+
+Every question of the set has one expected movie and, picked by hand, the
+plot sentence that answers it. Its retrieved context is the whole corpus in
+a fixed order, so neither the ranking nor the scoring reuses the term overlap
+the packer selects sentences with. The script reports the context tokens of
+the full JSON (what execute() used to send) and of the packed one, and how
+often the hand-picked evidence survives packing. That only shows what the
+packer keeps; answer quality is measured with ``--llm``, which asks
+gpt-4o-mini with both contexts and counts answers naming the expected title.
+
+    python eval_context_packer.py --budget 600 --sentences 3 [--llm]
+"""
+import argparse
+import os
+
+from context_packer import ContextPacker
+from mongo_retrieval import build_messages
+
+MOVIES = [
+    {
+        "Title": "Jaws",
+        "Year": 1975,
+        "Plot": "A great white shark begins attacking swimmers off Amity Island during the summer season. "
+        "The town's mayor refuses to close the beaches because the island depends on tourist money. "
+        "Police chief Martin Brody teams up with a marine biologist and a grizzled fisherman. "
+        "The three men set out on a small boat to hunt the shark. "
+        "The hunt becomes a desperate fight for survival at sea.",
+    },
+    {
+        "Title": "The Martian",
+        "Year": 2015,
+        "Plot": "During a storm on Mars, astronaut Mark Watney is struck by debris and presumed dead by his crew. "
+        "He wakes up alone in the red dust with limited supplies. "
+        "A botanist by training, he grows potatoes in the habitat to stretch his food. "
+        "NASA eventually discovers that he survived and races to plan a rescue. "
+        "His crewmates turn their ship around for a risky return mission.",
+    },
+    {
+        "Title": "Spirited Away",
+        "Year": 2001,
+        "Plot": "Ten-year-old Chihiro and her parents stumble into an abandoned amusement park while moving house. "
+        "Her parents eat food meant for spirits and are turned into pigs. "
+        "Chihiro takes a job at a bathhouse run by the witch Yubaba to survive. "
+        "Helped by the mysterious boy Haku, she works to free her parents. "
+        "Along the way she befriends the lonely spirit No-Face.",
+    },
+    {
+        "Title": "Inception",
+        "Year": 2010,
+        "Plot": "Dom Cobb is a thief who steals secrets from people's dreams. "
+        "He is offered a chance to clear his criminal record by planting an idea instead. "
+        "His team builds layered dream levels inside the mind of a business heir. "
+        "Time runs slower on each deeper level of the dream. "
+        "Cobb's guilt over his late wife threatens to sabotage the mission.",
+    },
+    {
+        "Title": "Toy Story",
+        "Year": 1995,
+        "Plot": "A cowboy doll named Woody is the favourite toy of a boy called Andy. "
+        "When Andy receives a space ranger action figure, Buzz Lightyear, Woody feels replaced. "
+        "Buzz believes he is a real space hero rather than a toy. "
+        "The rivals end up lost at a gas station and then in the house of a destructive neighbour. "
+        "They must work together to get home before Andy moves away.",
+    },
+    {
+        "Title": "The Shawshank Redemption",
+        "Year": 1994,
+        "Plot": "Banker Andy Dufresne is sentenced to life in Shawshank prison for murders he did not commit. "
+        "He befriends Red, an inmate who can smuggle in almost anything. "
+        "Andy helps the warden launder money while quietly running the prison library. "
+        "Over nineteen years he tunnels through his cell wall behind a poster. "
+        "He escapes through a sewage pipe and exposes the warden's corruption.",
+    },
+    {
+        "Title": "Jurassic Park",
+        "Year": 1993,
+        "Plot": "A billionaire builds a theme park on a remote island filled with cloned dinosaurs. "
+        "He invites two palaeontologists and a mathematician to endorse the park before it opens. "
+        "A disgruntled programmer shuts down the security systems to steal embryos. "
+        "The dinosaurs escape their enclosures during a tropical storm. "
+        "The visitors and the owner's grandchildren fight to survive the night.",
+    },
+    {
+        "Title": "Ratatouille",
+        "Year": 2007,
+        "Plot": "Remy is a rat with a refined sense of taste who dreams of becoming a chef. "
+        "He ends up in Paris in the kitchen of the late chef Gusteau. "
+        "Remy secretly guides a clumsy garbage boy named Linguini by pulling his hair. "
+        "Together they win over the city with their cooking. "
+        "A harsh food critic is finally moved by a simple dish of ratatouille.",
+    },
+]
+
+# Question, expected movie and the plot sentence that answers the question.
+QUESTIONS = [
+    (
+        "Suggest a movie about a shark attacking a beach town",
+        "Jaws",
+        "A great white shark begins attacking swimmers off Amity Island during the summer season.",
+    ),
+    (
+        "Movie where an astronaut is stranded alone on Mars growing potatoes",
+        "The Martian",
+        "A botanist by training, he grows potatoes in the habitat to stretch his food.",
+    ),
+    (
+        "Animated film where a girl's parents turn into pigs at a bathhouse",
+        "Spirited Away",
+        "Her parents eat food meant for spirits and are turned into pigs.",
+    ),
+    (
+        "A heist movie inside layered dreams",
+        "Inception",
+        "His team builds layered dream levels inside the mind of a business heir.",
+    ),
+    (
+        "A film about a cowboy doll jealous of a space ranger toy",
+        "Toy Story",
+        "When Andy receives a space ranger action figure, Buzz Lightyear, Woody feels replaced.",
+    ),
+    (
+        "Prison escape movie with a tunnel behind a poster",
+        "The Shawshank Redemption",
+        "Over nineteen years he tunnels through his cell wall behind a poster.",
+    ),
+    (
+        "Cloned dinosaurs escaping in a theme park",
+        "Jurassic Park",
+        "The dinosaurs escape their enclosures during a tropical storm.",
+    ),
+    (
+        "A rat who wants to become a chef in Paris",
+        "Ratatouille",
+        "Remy is a rat with a refined sense of taste who dreams of becoming a chef.",
+    ),
+]
+
+
+def retrieve(question: str):
+    """The whole corpus, in the same order for every question."""
+    return list(MOVIES)
+
+
+def has_evidence(expected: str, evidence: str, context) -> bool:
+    for doc in context:
+        if doc["Title"] == expected:
+            return evidence in doc["Plot"]
+    return False
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget", type=int, default=600)
+    parser.add_argument("--sentences", type=int, default=3)
+    parser.add_argument("--llm", action="store_true", help="also check answers with gpt-4o-mini")
+    args = parser.parse_args()
+
+    packer = ContextPacker(budget=args.budget, max_sentences=args.sentences)
+    llm = None
+    if args.llm:
+        from openai import OpenAI
+
+        llm = OpenAI(api_key=os.environ.get("OPENAI_API_KEY", ""))
+
+    before = after = full_evidence = packed_evidence = 0
+    full_correct = packed_correct = 0
+    for question, expected, evidence in QUESTIONS:
+        docs = retrieve(question)
+        packed, tokens = packer.pack(question, docs)
+        before += tokens["tokens_before"]
+        after += tokens["tokens_after"]
+        full_evidence += has_evidence(expected, evidence, docs)
+        packed_evidence += has_evidence(expected, evidence, packed)
+        if llm is not None:
+            for context, counter in ((docs, "full"), (packed, "packed")):
+                answer = llm.chat.completions.create(
+                    model="gpt-4o-mini", messages=build_messages(question, context)
+                ).choices[0].message.content
+                if expected.lower() in answer.lower():
+                    if counter == "full":
+                        full_correct += 1
+                    else:
+                        packed_correct += 1
+
+    n = len(QUESTIONS)
+    print(f"questions          {n}")
+    print(f"context tokens     full {before / n:8.1f}  packed {after / n:8.1f}  per question")
+    print(f"tokens saved       {(before - after) / n:8.1f} per question ({1 - after / before:.0%})")
+    print(f"evidence kept      full {full_evidence}/{n}  packed {packed_evidence}/{n}")
+    if llm is not None:
+        print(f"correct answers    full {full_correct}/{n}  packed {packed_correct}/{n}")
+    else:
+        print("correct answers    not measured, run with --llm")
+
+
+if __name__ == "__main__":
+    main()
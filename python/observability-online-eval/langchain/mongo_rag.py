@@ -7,6 +7,11 @@ from langchain.chat_models.openai import ChatOpenAI
 from langchain.tools import tool
 from langchain_openai import OpenAIEmbeddings
 
+from context_packer import ContextPacker
+from embedding_service import EmbeddingService
+from mongo_retrieval import (DEFAULT_LIMIT, DEFAULT_NUM_CANDIDATES, build_messages,
+                             parse_search_params, search_movies)
+
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
 
@@ -20,6 +25,9 @@ log_repo_id = os.environ.get("LOG_REPO_ID", "")
 openai_key = os.environ.get("OPENAI_API_KEY", "")
 mongo_uri = os.environ.get("MONGO_URI", "")
 
+EMBEDDING_MODEL = "text-embedding-ada-002"
+CHAT_MODEL = "gpt-4o-mini"
+
 logging.basicConfig(level=logging.INFO)
 
 maxim = Maxim(
@@ -29,66 +37,78 @@ maxim = Maxim(
 )
 
 logger = maxim.logger(LoggerConfig(id=log_repo_id))
-llm = ChatOpenAI(api_key=openai_key, model="gpt-4o-mini")
+llm = ChatOpenAI(api_key=openai_key, model=CHAT_MODEL)
 client = MongoClient(mongo_uri, server_api=ServerApi('1'))
 
 embeddings = OpenAIEmbeddings(
-    model="text-embedding-ada-002",
+    model=EMBEDDING_MODEL,
     openai_api_key=openai_key
 )
 
+
+def create_embedding_service(embeddings) -> EmbeddingService:
+    """Cached, micro-batched query embeddings, configured from the environment."""
+    return EmbeddingService(
+        embeddings,
+        maxsize=int(os.environ.get("EMBEDDING_CACHE_SIZE", "2048")),
+        ttl=float(os.environ.get("EMBEDDING_CACHE_TTL", "3600")),
+        batch_window=float(os.environ.get("EMBEDDING_BATCH_WINDOW_MS", "5")) / 1000,
+    )
+
+
+# Shared by all request threads
+embedding_service = create_embedding_service(embeddings)
+# Most relevant plot sentences of the retrieved movies, within a token budget
+context_packer = ContextPacker(
+    budget=int(os.environ.get("CONTEXT_TOKEN_BUDGET", "600")),
+    max_sentences=int(os.environ.get("CONTEXT_SENTENCES_PER_PLOT", "3")),
+)
+
 app = Flask(__name__)
 
 @retrieval(name="mongo-retrieval")
-def retrieve_docs(query: str):
+def retrieve_docs(
+    query: str,
+    num_candidates: int = DEFAULT_NUM_CANDIDATES,
+    limit: int = DEFAULT_LIMIT,
+):
     db= client["sample_mflix"]
     collection = db["embedded_movies"]
-    query_vector= embeddings.embed_query(query)
-
-    response = collection.aggregate([
-        {
-            '$vectorSearch': {
-                "index": "idx_plot_embedding",
-                "path": "plot_embedding",
-                "queryVector": query_vector,
-                "numCandidates": 50,
-                "limit": 10
-            }
-        }
-    ])
-    docs = [
-        {
-            "Title": item.get('title', 'N/A'),
-            "Plot": item.get('plot', 'N/A'),
-            "Year": item.get('year', 'N/A')
-        }
-        for item in response
-    ]
-    return docs
+    query_vector= embedding_service.embed_query(query)
+
+    return search_movies(collection, query_vector, num_candidates, limit)
 
 
 @langchain_llm_call(name="llm-call")
-def execute(query: str):
-    context = retrieve_docs(query)
-    messages = [
-        (
-            "system",
-            f"You are a smart movie recommendation expert. A question will be asked to you along with relevant information. "
-            f"Your task is to recommend the just title of the movie using this context: {json.dumps(context)}"
-            f"Respond in proper markdown format",
-        ),
-        ("human", query),
-    ]
+def execute(
+    query: str,
+    num_candidates: int = DEFAULT_NUM_CANDIDATES,
+    limit: int = DEFAULT_LIMIT,
+):
+    context, tokens = context_packer.pack(query, retrieve_docs(query, num_candidates, limit))
+    logging.info(f"Context tokens: {tokens['tokens_before']} -> {tokens['tokens_after']}")
+    messages = build_messages(query, context)
     result = llm.invoke(messages, config={"callbacks": [langchain_callback()]})
     return result.content
 
 
+@app.get("/embedding/stats")
+def embedding_stats():
+    return jsonify(embedding_service.stats())
+
+
 @app.post("/chat")
 @trace(logger=logger, name="movie-chat-v1")
 def handler():
     print(current_trace().id)
     query = request.json["query"]
-    result = execute(query)
+    try:
+        num_candidates, limit = parse_search_params(request.json)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    result = execute(query, num_candidates, limit)
     return jsonify({"result": result})
 
-app.run(port=8000)
\ No newline at end of file
+
+if __name__ == "__main__":
+    app.run(port=8000)
\ No newline at end of file
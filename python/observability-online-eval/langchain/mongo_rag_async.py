@@ -0,0 +1,166 @@
+"""
+Async serving mode of mongo_rag.py.
+
+The Mongo (Motor) and OpenAI clients are created once per process in the app
+lifespan and shared by every request, so concurrent requests multiplex over
+their connection pools on one event loop instead of each holding a worker
+thread for three blocking round trips. Query embeddings go through the same
+cache and micro-batching as mongo_rag.py, and the completion is logged as a
+generation of the request's trace. The embedding model and the database are
+warmed up concurrently at startup, and every stage of a request runs under
+its own timeout.
+
+The Maxim logger, the models, the context packer and the embedding cache
+settings are those of mongo_rag.py, which is imported for them.
+
+    MONGO_MAX_POOL_SIZE=100 python mongo_rag_async.py
+"""
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from uuid import uuid4
+
+from langchain_openai import OpenAIEmbeddings
+from maxim.logger.components.generation import GenerationConfig, GenerationError
+from maxim.logger.components.trace import Trace, TraceConfig
+from motor.motor_asyncio import AsyncIOMotorClient
+from openai import AsyncOpenAI
+from pymongo.server_api import ServerApi
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from mongo_rag import (CHAT_MODEL, EMBEDDING_MODEL, context_packer, create_embedding_service,
+                       logger, mongo_uri, openai_key)
+from mongo_retrieval import build_messages, build_pipeline, parse_search_params, to_docs
+
+mongo_max_pool_size = int(os.environ.get("MONGO_MAX_POOL_SIZE", "100"))
+embed_timeout = float(os.environ.get("EMBED_TIMEOUT", "5"))
+search_timeout = float(os.environ.get("SEARCH_TIMEOUT", "5"))
+llm_timeout = float(os.environ.get("LLM_TIMEOUT", "30"))
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    app.state.mongo = AsyncIOMotorClient(
+        mongo_uri, server_api=ServerApi("1"), maxPoolSize=mongo_max_pool_size
+    )
+    app.state.openai = AsyncOpenAI(api_key=openai_key)
+    app.state.collection = app.state.mongo["sample_mflix"]["embedded_movies"]
+    # Cached, micro-batched query embeddings, over the shared OpenAI client
+    app.state.embedding_service = create_embedding_service(
+        OpenAIEmbeddings(
+            model=EMBEDDING_MODEL,
+            openai_api_key=openai_key,
+            async_client=app.state.openai.embeddings,
+        )
+    )
+
+    # Open the first connections of both pools before taking traffic.
+    results = await asyncio.gather(
+        app.state.mongo.admin.command("ping"),
+        app.state.openai.embeddings.create(model=EMBEDDING_MODEL, input="warmup"),
+        return_exceptions=True,
+    )
+    for name, result in zip(("mongo", "openai"), results):
+        if isinstance(result, Exception):
+            logging.warning(f"{name} warmup failed: {result}")
+    try:
+        yield
+    finally:
+        app.state.mongo.close()
+        await app.state.openai.close()
+
+
+async def retrieve_docs(collection, query_vector, num_candidates: int, limit: int):
+    cursor = collection.aggregate(build_pipeline(query_vector, num_candidates, limit))
+    return to_docs(await cursor.to_list(length=limit))
+
+
+async def complete(client: AsyncOpenAI, trace: Trace, query: str, context) -> str:
+    context, tokens = context_packer.pack(query, context)
+    logging.info(f"Context tokens: {tokens['tokens_before']} -> {tokens['tokens_after']}")
+    messages = build_messages(query, context)
+    generation = trace.generation(
+        GenerationConfig(
+            id=str(uuid4()),
+            name="llm-call",
+            provider="openai",
+            model=CHAT_MODEL,
+            messages=messages,
+        )
+    )
+    try:
+        response = await client.chat.completions.create(model=CHAT_MODEL, messages=messages)
+    except BaseException as e:
+        # Also covers the stage timeout cancelling the call.
+        generation.error(GenerationError(str(e) or type(e).__name__))
+        raise
+    generation.result(response)
+    return response.choices[0].message.content
+
+
+async def embedding_stats(request: Request):
+    return JSONResponse(request.app.state.embedding_service.stats())
+
+
+async def chat(request: Request):
+    try:
+        body = await request.json()
+    except ValueError:
+        return JSONResponse({"error": "body must be JSON"}, status_code=400)
+    if not isinstance(body, dict):
+        return JSONResponse({"error": "body must be a JSON object"}, status_code=400)
+    query = body.get("query")
+    if not query:
+        return JSONResponse({"error": "query is required"}, status_code=400)
+    try:
+        num_candidates, limit = parse_search_params(body)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    state = request.app.state
+    trace = logger.trace(TraceConfig(id=str(uuid4()), name="movie-chat-async-v1"))
+    trace.set_input(query)
+    stage = "embedding"
+    try:
+        query_vector = await asyncio.wait_for(
+            state.embedding_service.aembed_query(query), embed_timeout
+        )
+        stage = "vector search"
+        context = await asyncio.wait_for(
+            retrieve_docs(state.collection, query_vector, num_candidates, limit),
+            search_timeout,
+        )
+        stage = "completion"
+        result = await asyncio.wait_for(
+            complete(state.openai, trace, query, context), llm_timeout
+        )
+        trace.set_output(result)
+    except asyncio.TimeoutError:
+        trace.set_output(f"{stage} timed out")
+        return JSONResponse({"error": f"{stage} timed out"}, status_code=504)
+    except Exception as e:
+        logging.error(f"Chat endpoint error: {e}")
+        trace.set_output(str(e))
+        return JSONResponse({"error": str(e)}, status_code=500)
+    finally:
+        trace.end()
+    return JSONResponse({"result": result})
+
+
+app = Starlette(
+    routes=[
+        Route("/chat", chat, methods=["POST"]),
+        Route("/embedding/stats", embedding_stats, methods=["GET"]),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, port=8000)
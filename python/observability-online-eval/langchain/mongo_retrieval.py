@@ -0,0 +1,120 @@
+import json
+from typing import Any, Dict, Iterable, List, Tuple
+
+VECTOR_INDEX = "idx_plot_embedding"
+VECTOR_PATH = "plot_embedding"
+DEFAULT_NUM_CANDIDATES = 50
+DEFAULT_LIMIT = 10
+# Atlas Vector Search rejects larger values.
+MAX_NUM_CANDIDATES = 10_000
+
+# Only the fields the prompt uses, plus the similarity score. Without it the
+# aggregate returns whole documents, embedding included.
+PROJECTION = {
+    "_id": 0,
+    "title": 1,
+    "plot": 1,
+    "year": 1,
+    "score": {"$meta": "vectorSearchScore"},
+}
+
+
+def validate_search_params(num_candidates: int, limit: int) -> None:
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    if not limit <= num_candidates <= MAX_NUM_CANDIDATES:
+        raise ValueError(
+            f"num_candidates must be between limit ({limit}) and {MAX_NUM_CANDIDATES}"
+        )
+
+
+def _as_int(name: str, value: Any) -> int:
+    """``value`` as an int, if it is an integer, an integral float or an integer string."""
+    if isinstance(value, bool):
+        raise ValueError(f"{name} must be an integer")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    raise ValueError(f"{name} must be an integer")
+
+
+def parse_search_params(params: Dict[str, Any]) -> Tuple[int, int]:
+    """
+    ``num_candidates`` and ``limit`` of a request body, defaulted and validated.
+
+    Raises ValueError when either is not an integer or out of range. Booleans
+    and fractional numbers are rejected rather than truncated.
+    """
+    num_candidates = _as_int(
+        "num_candidates", params.get("num_candidates", DEFAULT_NUM_CANDIDATES)
+    )
+    limit = _as_int("limit", params.get("limit", DEFAULT_LIMIT))
+    validate_search_params(num_candidates, limit)
+    return num_candidates, limit
+
+
+def build_pipeline(
+    query_vector: List[float],
+    num_candidates: int = DEFAULT_NUM_CANDIDATES,
+    limit: int = DEFAULT_LIMIT,
+) -> List[Dict[str, Any]]:
+    """
+    ``$vectorSearch`` aggregate returning the projected top ``limit`` movies.
+
+    ``num_candidates`` is the number of nearest neighbours the approximate
+    search considers; raising it improves recall at the cost of latency.
+    """
+    validate_search_params(num_candidates, limit)
+    return [
+        {
+            "$vectorSearch": {
+                "index": VECTOR_INDEX,
+                "path": VECTOR_PATH,
+                "queryVector": query_vector,
+                "numCandidates": num_candidates,
+                "limit": limit,
+            }
+        },
+        {"$project": PROJECTION},
+    ]
+
+
+def to_docs(items: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "Title": item.get("title", "N/A"),
+            "Plot": item.get("plot", "N/A"),
+            "Year": item.get("year", "N/A"),
+            "Score": item.get("score"),
+        }
+        for item in items
+    ]
+
+
+def build_messages(query: str, context: Any) -> List[Dict[str, str]]:
+    """Chat messages asking for a recommendation from the retrieved movies."""
+    return [
+        {
+            "role": "system",
+            "content": "You are a smart movie recommendation expert. A question will be asked to you along with relevant information. "
+            f"Your task is to recommend the just title of the movie using this context: {json.dumps(context)}"
+            "Respond in proper markdown format",
+        },
+        {"role": "user", "content": query},
+    ]
+
+
+def search_movies(
+    collection,
+    query_vector: List[float],
+    num_candidates: int = DEFAULT_NUM_CANDIDATES,
+    limit: int = DEFAULT_LIMIT,
+) -> List[Dict[str, Any]]:
+    """Top movies for ``query_vector``, most similar first."""
+    return to_docs(collection.aggregate(build_pipeline(query_vector, num_candidates, limit)))
@@ -0,0 +1,45 @@
+"""
+Per-callback overhead of NodeMetricsHandler.
+
+Replays node -> inner chain -> chat model start/end callbacks with
+pre-generated run ids and reports the cost per event, then prints the
+resulting snapshot.
+
+    python bench_node_metrics.py --runs 100000
+"""
+import argparse
+import json
+import time
+from uuid import uuid4
+
+from node_metrics import NodeMetrics, NodeMetricsHandler
+
+
+def drive(handler: NodeMetricsHandler, runs: int) -> float:
+    ids = [(uuid4(), uuid4(), uuid4()) for _ in range(runs)]
+    node = {"langgraph_node": "agent"}
+    model = {"langgraph_node": "agent", "ls_model_name": "gpt-4"}
+    start = time.perf_counter()
+    for node_id, inner_id, llm_id in ids:
+        handler.on_chain_start({}, {}, run_id=node_id, metadata=node, name="agent")
+        handler.on_chain_start({}, {}, run_id=inner_id, metadata=node, name="RunnableSequence")
+        handler.on_chat_model_start({}, [[]], run_id=llm_id, metadata=model)
+        handler.on_llm_end(None, run_id=llm_id)
+        handler.on_chain_end({}, run_id=inner_id)
+        handler.on_chain_end({}, run_id=node_id)
+    elapsed = time.perf_counter() - start
+    return elapsed / (runs * 6) * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=100_000)
+    args = parser.parse_args()
+
+    metrics = NodeMetrics()
+    print(f"{drive(NodeMetricsHandler(metrics), args.runs):8.0f} ns/event")
+    print(json.dumps(metrics.snapshot(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
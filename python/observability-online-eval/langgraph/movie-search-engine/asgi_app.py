@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import os
+import sys
+from typing import Awaitable, Callable, Optional
+
+# node_metrics.py is shared with the multi-agent app, one directory up.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from node_metrics import metrics
+
+
+class ConcurrencyLimiter:
+    """
+    Caps the requests running at once and the requests waiting for a slot.
+
+    Args:
+        max_concurrency: Requests allowed to run the agent at the same time.
+        max_waiting: Requests allowed to wait for a slot; more are rejected.
+        queue_timeout: Seconds a request may wait before it is rejected.
+    """
+
+    def __init__(self, max_concurrency: int, max_waiting: int, queue_timeout: float) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def acquire(self) -> bool:
+        if self.waiting >= self.max_waiting and self._semaphore.locked():
+            self.rejected += 1
+            return False
+        self.waiting += 1
+        # asyncio.wait never cancels the acquire itself, so unlike wait_for
+        # before Python 3.12 it cannot drop a permit granted right at the
+        # timeout; _abandon gives such a permit back.
+        acquiring = asyncio.ensure_future(self._semaphore.acquire())
+        try:
+            done, _ = await asyncio.wait({acquiring}, timeout=self.queue_timeout)
+        except BaseException:
+            self._abandon(acquiring)
+            raise
+        finally:
+            self.waiting -= 1
+        if not done:
+            self._abandon(acquiring)
+            self.rejected += 1
+            return False
+        self.running += 1
+        return True
+
+    def _abandon(self, acquiring: "asyncio.Future[bool]") -> None:
+        if not acquiring.done():
+            # A pending acquire that is cancelled never keeps its permit.
+            acquiring.cancel()
+        elif not acquiring.cancelled() and acquiring.exception() is None:
+            self._semaphore.release()
+
+    def release(self) -> None:
+        self.running -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "max_concurrency": self.max_concurrency,
+            "max_waiting": self.max_waiting,
+        }
+
+
+def create_app(
+    ask_agent: Callable[[dict, str], Awaitable[Optional[str]]],
+    semantic_cache=None,
+    trace: Optional[Callable[[Callable], Callable]] = None,
+    max_concurrency: int = 32,
+    max_waiting: int = 64,
+    queue_timeout: float = 30.0,
+) -> Starlette:
+    """
+    ASGI variant of the movie-search /chat endpoint.
+
+    Every request awaits ``ask_agent`` on the server's event loop, so the
+    model calls, the Weaviate retriever and the Tavily search of concurrent
+    requests share one loop instead of one loop and thread per request. At
+    most ``max_concurrency`` requests run the agent at once; up to
+    ``max_waiting`` more queue for a slot and any further request gets a 503
+    with ``Retry-After`` rather than piling up in memory.
+
+    Args:
+        ask_agent: Runs the agent on ``(initial_state, query)`` and returns its
+            answer, such as the traced ``main.ask_agent``.
+        semantic_cache: Optional :class:`semantic_cache.SemanticCache` checked
+            before the agent runs.
+        trace: Optional decorator opening the trace a request is logged
+            under, as ``@trace`` does for the Flask endpoint.
+        max_concurrency: Requests running the agent at the same time.
+        max_waiting: Requests queued for a slot before new ones are rejected.
+        queue_timeout: Seconds a queued request waits before it is rejected.
+    """
+    limiter = ConcurrencyLimiter(max_concurrency, max_waiting, queue_timeout)
+
+    async def answer(query: str) -> Optional[str]:
+        vector = None
+        response = None
+        if semantic_cache is not None:
+            vector = await semantic_cache.aembed(query)
+            response = semantic_cache.lookup(vector)
+        if response is None:
+            initial_state = {"messages": query, "retriever_tried": False}
+            response = await ask_agent(initial_state, query)
+            if vector is not None and response is not None:
+                semantic_cache.put(vector, query, response)
+        return response
+
+    if trace is not None:
+        answer = trace(answer)
+
+    async def chat(request: Request):
+        body = await request.json()
+        query = body.get("query")
+        if not query:
+            return JSONResponse({"error": "query is required"}, status_code=400)
+        if not await limiter.acquire():
+            return JSONResponse(
+                {"error": "server busy"}, status_code=503, headers={"Retry-After": "1"}
+            )
+        try:
+            return JSONResponse({"result": await answer(query)})
+        except Exception as e:
+            logging.error(f"Chat endpoint error: {e}")
+            return JSONResponse({"error": str(e)}, status_code=500)
+        finally:
+            limiter.release()
+
+    async def stats(request: Request):
+        result = {"limiter": limiter.stats()}
+        if semantic_cache is not None:
+            result["semantic_cache"] = semantic_cache.stats()
+        return JSONResponse(result)
+
+    async def metrics_endpoint(request: Request):
+        return JSONResponse(metrics.snapshot())
+
+    return Starlette(
+        routes=[
+            Route("/chat", chat, methods=["POST"]),
+            Route("/cache/stats", stats, methods=["GET"]),
+            Route("/metrics", metrics_endpoint, methods=["GET"]),
+        ]
+    )
+
+
+if __name__ == "__main__":
+    from functools import wraps
+
+    import uvicorn
+    from maxim.decorators import current_trace, trace
+
+    from main import ask_agent, logger, semantic_cache
+
+    def traced(func):
+        @trace(logger=logger, name="movie-search-v1")
+        @wraps(func)
+        async def wrapper(query: str):
+            current_trace().set_input(query)
+            return await func(query)
+
+        return wrapper
+
+    uvicorn.run(
+        create_app(
+            ask_agent,
+            semantic_cache,
+            traced,
+            max_concurrency=int(os.environ.get("CHAT_MAX_CONCURRENCY", "32")),
+            max_waiting=int(os.environ.get("CHAT_MAX_WAITING", "64")),
+        ),
+        port=8000,
+    )
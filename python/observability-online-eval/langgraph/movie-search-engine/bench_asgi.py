@@ -0,0 +1,99 @@
+"""
+Load test for the /chat endpoint in asgi_app.py against stubbed backends.
+
+The agent is replaced by a stub that sleeps like the model, Weaviate and the
+model again would, and the app is served by
+uvicorn on a local port. The test reports latency percentiles of successful
+requests, throughput and how many requests were shed with a 503.
+
+    python bench_asgi.py --requests 500 --concurrency 200 --max-concurrency 64
+"""
+import argparse
+import asyncio
+import socket
+import statistics
+import time
+from typing import List, Optional, Tuple
+
+import httpx
+import uvicorn
+
+from asgi_app import create_app
+
+
+def stub_agent(model_latency: float, retriever_latency: float):
+    async def ask_agent(initial_state: dict, query: str) -> Optional[str]:
+        await asyncio.sleep(model_latency)
+        await asyncio.sleep(retriever_latency)
+        await asyncio.sleep(model_latency)
+        return "stub answer"
+
+    return ask_agent
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def one_request(client: httpx.AsyncClient, url: str) -> Tuple[int, float]:
+    start = time.perf_counter()
+    response = await client.post(url, json={"query": "stub"})
+    return response.status_code, time.perf_counter() - start
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def main(args) -> None:
+    port = free_port()
+    app = create_app(
+        stub_agent(args.model_latency, args.retriever_latency),
+        max_concurrency=args.max_concurrency,
+        max_waiting=args.max_waiting,
+    )
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    url = f"http://127.0.0.1:{port}/chat"
+    semaphore = asyncio.Semaphore(args.concurrency)
+    limits = httpx.Limits(max_connections=args.concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+
+        async def bounded():
+            async with semaphore:
+                return await one_request(client, url)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(bounded() for _ in range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+    server.should_exit = True
+    await serving
+
+    ok = [r[1] * 1000 for r in results if r[0] == 200]
+    rejected = sum(1 for r in results if r[0] == 503)
+    print(
+        f"requests={args.requests} concurrency={args.concurrency} "
+        f"max_concurrency={args.max_concurrency} max_waiting={args.max_waiting}"
+    )
+    if ok:
+        print(f"latency p50={statistics.median(ok):8.2f} ms  p99={percentile(ok, 0.99):8.2f} ms")
+    print(f"throughput {len(ok) / elapsed:.1f} req/s  rejected(503)={rejected}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--max-concurrency", type=int, default=64)
+    parser.add_argument("--max-waiting", type=int, default=64)
+    parser.add_argument("--model-latency", type=float, default=0.2)
+    parser.add_argument("--retriever-latency", type=float, default=0.05)
+    asyncio.run(main(parser.parse_args()))
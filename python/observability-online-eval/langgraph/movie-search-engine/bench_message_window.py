@@ -0,0 +1,133 @@
+"""
+Prompt tokens per model call with and without the message window.
+
+Replays a set of conversations through the prompt builder the way the agent
+graph grows its history (question, tool call, tool result, answer) and, for
+every model call, compares the legacy prompt (system prompt plus the full
+history, re-encoded each time) with MessageWindow, and checks that every
+window is a valid prompt. Conversations are either
+generated or loaded from a JSON file holding a list of conversations, each a
+list of ``message_to_dict`` dicts.
+
+    python bench_message_window.py --conversations 20 --turns 12 --budget 3000
+"""
+import argparse
+import json
+import random
+import time
+from typing import List
+
+from langchain_core.messages import (AIMessage, BaseMessage, HumanMessage,
+                                     ToolMessage, messages_from_dict)
+
+from message_window import MESSAGE_OVERHEAD, MessageWindow
+
+SYSTEM_PROMPT = """You are a helpful movie information assistant. You have search_movie and tavily search tools.
+    Priorotise database search but if you need to do a general search, use tavily search. Make sure your answer is valid irrespective of the search.
+    Always provide clear, concise answers."""
+
+WORDS = "movie director actor plot year drama thriller comedy award sequel scene".split()
+
+
+def generate(conversations: int, turns: int, seed: int = 0) -> List[List[BaseMessage]]:
+    rng = random.Random(seed)
+    result = []
+    for c in range(conversations):
+        messages: List[BaseMessage] = []
+        for t in range(turns):
+            query = " ".join(rng.choices(WORDS, k=8))
+            # Some turns call both tools in parallel, some return huge results.
+            call_ids = [f"call_{c}_{t}_{i}" for i in range(rng.choice([1, 1, 2]))]
+            result_words = rng.choice([600, 600, 600, 4000])
+            messages += [
+                HumanMessage(content=f"Tell me about {query}?", id=f"h{c}_{t}"),
+                AIMessage(
+                    content="",
+                    tool_calls=[
+                        {"name": "search_movies", "args": {"query": query}, "id": call_id}
+                        for call_id in call_ids
+                    ],
+                    id=f"a{c}_{t}",
+                ),
+            ]
+            messages += [
+                ToolMessage(
+                    content="Found in movie database: " + " ".join(rng.choices(WORDS, k=result_words)),
+                    tool_call_id=call_id,
+                    id=f"t{c}_{t}_{i}",
+                )
+                for i, call_id in enumerate(call_ids)
+            ]
+            messages.append(AIMessage(content=" ".join(rng.choices(WORDS, k=80)), id=f"r{c}_{t}"))
+        result.append(messages)
+    return result
+
+
+def legacy_tokens(window: MessageWindow, messages: List[BaseMessage]) -> int:
+    # What the old call_model sent: every message, encoded again on each call.
+    encode = window.encoding.encode
+    total = MESSAGE_OVERHEAD + len(encode(SYSTEM_PROMPT))
+    for m in messages:
+        total += MESSAGE_OVERHEAD + len(encode(str(m.content)))
+        if getattr(m, "tool_calls", None):
+            total += len(encode(json.dumps(m.tool_calls, default=str)))
+    return total
+
+
+def check_window(window: List[BaseMessage], history: List[BaseMessage]) -> None:
+    """Fail unless ``window`` is a prompt the chat API accepts."""
+    latest_question = next(m for m in reversed(history) if isinstance(m, HumanMessage))
+    assert latest_question in window, "latest question trimmed"
+    assert window[-1] is history[-1], "latest message trimmed"
+    assert not isinstance(window[0], ToolMessage), "window starts with a tool result"
+    open_calls = set()
+    for message in window:
+        if isinstance(message, AIMessage):
+            open_calls = {call["id"] for call in message.tool_calls}
+        elif isinstance(message, ToolMessage):
+            assert message.tool_call_id in open_calls, "tool result without its tool call"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=12)
+    parser.add_argument("--budget", type=int, default=3000)
+    parser.add_argument("--input", help="JSON file of recorded conversations")
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, "r", encoding="utf-8") as f:
+            conversations = [messages_from_dict(c) for c in json.load(f)]
+    else:
+        conversations = generate(args.conversations, args.turns)
+
+    window = MessageWindow(SYSTEM_PROMPT, max_tokens=args.budget)
+    calls = legacy = windowed = 0
+    legacy_seconds = window_seconds = 0.0
+    for messages in conversations:
+        # The model is called after every human and tool message.
+        for end, message in enumerate(messages, start=1):
+            if not isinstance(message, (HumanMessage, ToolMessage)):
+                continue
+            history = messages[:end]
+            start = time.perf_counter()
+            legacy += legacy_tokens(window, history)
+            legacy_seconds += time.perf_counter() - start
+            start = time.perf_counter()
+            trimmed, _, tokens = window.trim(history)
+            window_seconds += time.perf_counter() - start
+            check_window(trimmed, history)
+            windowed += tokens
+            calls += 1
+
+    print(f"model calls        {calls}")
+    print(f"legacy tokens/call {legacy / calls:10.1f}")
+    print(f"window tokens/call {windowed / calls:10.1f}")
+    print(f"saved tokens/call  {(legacy - windowed) / calls:10.1f}")
+    print(f"counting legacy    {legacy_seconds / calls * 1e3:10.3f} ms/call")
+    print(f"counting window    {window_seconds / calls * 1e3:10.3f} ms/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,179 +1,341 @@
+import argparse
+import json
 import os
+import sys
+from typing import List, Optional
+
+# weaviate_client.py is shared with the app, one directory up.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import pandas as pd
-import weaviate
 import weaviate.classes as wvc
 from tqdm import tqdm
+from weaviate.util import generate_uuid5
 from weaviate.collections.classes.config import (Configure, VectorDistances,
                                                  VectorIndexConfigDynamic,
-                                                 VectorizerConfig)
+                                                 VectorizerConfig, Vectorizers)
 
 import dotenv
 
+from preprocess import (CHUNK_SIZE, MOVIES_PATH, iter_movie_chunks,
+                        iter_parquet_chunks, load_plots, preprocess)
+from vector_cache import HashEmbedder, LocalVectorizer, VectorCache
+from weaviate_client import close_client, get_client, weaviate_url
+
 dotenv.load_dotenv()
 
 openai_key = os.environ.get("OPENAI_API_KEY", "")
-weaviate_url = os.environ.get("WEAVIATE_URL", "")
-weaviate_key = os.environ.get("WEAVIATE_API_KEY", "")
-
-print(weaviate_url)
-
-# Setting up client
-client = weaviate.connect_to_weaviate_cloud(
-    cluster_url=weaviate_url,
-    auth_credentials=weaviate.auth.AuthApiKey(api_key=weaviate_key),
-    headers={
-        "X-OpenAI-Api-Key": openai_key,  # Replace with your OpenAI key
-    },
-)
-
-# Load and prepare dataset
-df = pd.read_csv(
-    "movie_data.csv",
-    usecols=[
-        "id",
-        "Name",
-        "PosterLink",
-        "Genres",
-        "Actors",
-        "Director",
-        "Description",
-        "DatePublished",
-        "Keywords",
-    ],
-    parse_dates=["DatePublished"],
-    on_bad_lines="skip",
-    low_memory=False,
-    skip_blank_lines=True,
-    verbose=True,
-)
-df["year"] = df["DatePublished"].dt.year.fillna(0).astype(int)
-df.drop(["DatePublished"], axis=1, inplace=True)
-df = df[df.year > 1970]
-
-# Plot dataset
-plots = pd.read_csv("wiki_movie_plots_deduped.csv")
-plots = plots[plots["Release Year"] > 1970]
-plots = plots[plots.duplicated(subset=["Title", "Release Year", "Plot"]) == False]
-plots = plots[plots.duplicated(subset=["Title", "Release Year"]) == False]
-plots = plots[["Title", "Plot", "Release Year"]]
-
-plots.columns = ["Name", "Plot", "year"]
-
-# Merge
-df = df.merge(plots, on=["Name", "year"], how="left").fillna("")
-df.reset_index(drop=True, inplace=True)
 
 collection_name = "Awesome_moviate_movies"
 
-# Checking if Movies schema already exists, then delete it
-if client.collections.exists(collection_name):
-    client.collections.delete(collection_name)
-
-# Create collection with proper configuration
-collection = client.collections.create(
-    name=collection_name,
-    description="A collection of movies since 1970.",
-    vectorizer_config=Configure.Vectorizer.text2vec_openai(
-        model="text-embedding-3-small",
-        model_version="3",
-        type_="text",        
-        vectorize_collection_name=False
-    ),
-    vector_index_config=Configure.VectorIndex.hnsw(
-        distance_metric=VectorDistances.COSINE
-    ),
-    properties=[
-        wvc.config.Property(
-            name="movie_id",
-            data_type=wvc.config.DataType.NUMBER,
-            description="The id of the movie",
-            skip_vectorization=True
-        ),
-        wvc.config.Property(
-            name="title",
-            data_type=wvc.config.DataType.TEXT,
-            description="The name of the movie",
-            skip_vectorization=True
-        ),
-        wvc.config.Property(
-            name="year",
-            data_type=wvc.config.DataType.NUMBER,
-            description="The year in which movie was published",
-            skip_vectorization=True
-        ),
-        wvc.config.Property(
-            name="poster_link",
-            data_type=wvc.config.DataType.TEXT,
-            description="The poster link of the movie",
-            skip_vectorization=True
-        ),
-        wvc.config.Property(
-            name="genres",
-            data_type=wvc.config.DataType.TEXT,
-            description="The genres of the movie",
-            skip_vectorization=True
-        ),
-        wvc.config.Property(
-            name="actors",
-            data_type=wvc.config.DataType.TEXT,
-            description="The actors of the movie",
-            skip_vectorization=True
-        ),
-        wvc.config.Property(
-            name="director",
-            data_type=wvc.config.DataType.TEXT,
-            description="Director of the movie",
-            skip_vectorization=True
-        ),
-        wvc.config.Property(
-            name="description",
-            data_type=wvc.config.DataType.TEXT,
-            description="overview of the movie"
-        ),
-        wvc.config.Property(
-            name="Plot",
-            data_type=wvc.config.DataType.TEXT,
-            description="Plot of the movie from Wikipedia"
-        ),
-        wvc.config.Property(
-            name="keywords",
-            data_type=wvc.config.DataType.TEXT,
-            description="main keywords of the movie"
+CHECKPOINT_PATH = "import_checkpoint.json"
+ERRORS_PATH = "import_errors.jsonl"
+VECTOR_CACHE_PATH = "vectors.sqlite"
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 1536
+
+
+def build_objects(df: pd.DataFrame) -> List[dict]:
+    """Build the Weaviate properties of a chunk column by column."""
+    return pd.DataFrame(
+        {
+            "movie_id": df["id"].astype(float),
+            "title": df["Name"].astype(str).str.lower(),
+            "year": df["year"].astype(int),
+            "poster_link": df["PosterLink"].astype(str),
+            "genres": df["Genres"].astype(str),
+            "actors": df["Actors"].astype(str).str.lower(),
+            "director": df["Director"].astype(str).str.lower(),
+            "description": df["Description"].astype(str),
+            "plot": df["Plot"].astype(str),
+            "keywords": df["Keywords"].astype(str),
+        }
+    ).to_dict("records")
+
+
+def movie_uuid(movie_id: float) -> str:
+    """Stable object UUID, so re-importing a movie overwrites it."""
+    return generate_uuid5(int(movie_id), collection_name)
+
+
+def source_signature(path: str, chunksize: int) -> dict:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "chunksize": chunksize}
+
+
+def read_checkpoint(signature: dict, path: str = CHECKPOINT_PATH) -> Optional[dict]:
+    """Last committed chunk, if it belongs to the same source and chunk size."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        checkpoint = json.load(f)
+    return checkpoint if checkpoint.get("source") == signature else None
+
+
+def write_checkpoint(checkpoint: dict, path: str = CHECKPOINT_PATH) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+# Local vectors embed vector_cache.vector_text, not the text text2vec_openai
+# builds from the class and property names, so the two sources must never
+# share a collection: local vectors go to one without a server vectorizer.
+VECTORIZERS = {"server": Vectorizers.TEXT2VEC_OPENAI, "local": Vectorizers.NONE}
+
+
+def create_collection(client, recreate: bool = True, vectors: str = "server"):
+    if client.collections.exists(collection_name):
+        if not recreate:
+            collection = client.collections.get(collection_name)
+            vectorizer = collection.config.get().vectorizer
+            if vectorizer != VECTORIZERS[vectors]:
+                existing = "local" if vectorizer == Vectorizers.NONE else "server"
+                raise ValueError(
+                    f"{collection_name} holds {existing} vectors, so it cannot be "
+                    f"upserted with --vectors {vectors}; use --vectors {existing} "
+                    "or --mode recreate"
+                )
+            return collection
+        # Checking if Movies schema already exists, then delete it
+        client.collections.delete(collection_name)
+
+    if vectors == "local":
+        vectorizer_config = Configure.Vectorizer.none()
+    else:
+        vectorizer_config = Configure.Vectorizer.text2vec_openai(
+            model=EMBEDDING_MODEL,
+            model_version="3",
+            type_="text",
+            vectorize_collection_name=False
         )
-    ]
-)
-
-data_rows = []
-# Importing the data
-for i in tqdm(range(len(df))):
-    item = df.iloc[i]
-
-    movie_object = {
-        "movie_id": float(item["id"]),
-        "title": str(item["Name"]).lower(),
-        "year": int(item["year"]),
-        "poster_link": str(item["PosterLink"]),
-        "genres": str(item["Genres"]),
-        "actors": str(item["Actors"]).lower(),
-        "director": str(item["Director"]).lower(),
-        "description": str(item["Description"]),
-        "plot": str(item["Plot"]),
-        "keywords": str(item["Keywords"]),
-    }
-    data_rows.append(movie_object)
-
-try:
+
+    # Create collection with proper configuration
+    return client.collections.create(
+        name=collection_name,
+        description="A collection of movies since 1970.",
+        vectorizer_config=vectorizer_config,
+        vector_index_config=Configure.VectorIndex.hnsw(
+            distance_metric=VectorDistances.COSINE
+        ),
+        properties=[
+            wvc.config.Property(
+                name="movie_id",
+                data_type=wvc.config.DataType.NUMBER,
+                description="The id of the movie",
+                skip_vectorization=True
+            ),
+            wvc.config.Property(
+                name="title",
+                data_type=wvc.config.DataType.TEXT,
+                description="The name of the movie",
+                skip_vectorization=True
+            ),
+            wvc.config.Property(
+                name="year",
+                data_type=wvc.config.DataType.NUMBER,
+                description="The year in which movie was published",
+                skip_vectorization=True
+            ),
+            wvc.config.Property(
+                name="poster_link",
+                data_type=wvc.config.DataType.TEXT,
+                description="The poster link of the movie",
+                skip_vectorization=True
+            ),
+            wvc.config.Property(
+                name="genres",
+                data_type=wvc.config.DataType.TEXT,
+                description="The genres of the movie",
+                skip_vectorization=True
+            ),
+            wvc.config.Property(
+                name="actors",
+                data_type=wvc.config.DataType.TEXT,
+                description="The actors of the movie",
+                skip_vectorization=True
+            ),
+            wvc.config.Property(
+                name="director",
+                data_type=wvc.config.DataType.TEXT,
+                description="Director of the movie",
+                skip_vectorization=True
+            ),
+            wvc.config.Property(
+                name="description",
+                data_type=wvc.config.DataType.TEXT,
+                description="overview of the movie"
+            ),
+            wvc.config.Property(
+                name="Plot",
+                data_type=wvc.config.DataType.TEXT,
+                description="Plot of the movie from Wikipedia"
+            ),
+            wvc.config.Property(
+                name="keywords",
+                data_type=wvc.config.DataType.TEXT,
+                description="main keywords of the movie"
+            )
+        ]
+    )
+
+
+def create_embedder(name: str):
+    if name == "fake":
+        return HashEmbedder(dimensions=EMBEDDING_DIMENSIONS)
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(
+        model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSIONS, api_key=openai_key
+    )
+
+
+def import_chunk(
+    collection,
+    objects: List[dict],
+    errors_file,
+    vectors: Optional[List[List[float]]] = None,
+) -> int:
+    """
+    Upsert one chunk and record every object the batch rejected.
+
+    When ``vectors`` is given, Weaviate stores them as-is instead of calling
+    the vectorizer once per object.
+    """
     with collection.batch.dynamic() as batch:
-        for data_row in data_rows:
+        for i, movie_object in enumerate(objects):
             batch.add_object(
-                properties=data_row,
-            )            
-        batch.flush()
-except BaseException as error:
-    print("Import Failed at: ", i)
-    print("An exception occurred: {}".format(error))
-    # Stop the import on error    
+                properties=movie_object,
+                uuid=movie_uuid(movie_object["movie_id"]),
+                vector=vectors[i] if vectors is not None else None,
+            )
+    failed = collection.batch.failed_objects
+    for error in failed:
+        errors_file.write(
+            json.dumps(
+                {
+                    "uuid": str(error.object_.uuid),
+                    "movie_id": error.object_.properties.get("movie_id"),
+                    "message": error.message,
+                }
+            )
+            + "\n"
+        )
+    return len(failed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import movies into Weaviate.")
+    parser.add_argument(
+        "--mode",
+        choices=["recreate", "upsert"],
+        default="recreate",
+        help="recreate drops the collection first; upsert keeps it and overwrites "
+        "movies by their deterministic UUID",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="in upsert mode, skip the chunks committed by the previous run",
+    )
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    parser.add_argument(
+        "--source",
+        choices=["parquet", "csv"],
+        default="parquet",
+        help="parquet reuses the merged cache written by preprocess.py (building it "
+        "if the CSVs changed); csv merges the CSVs on the fly",
+    )
+    parser.add_argument(
+        "--vectors",
+        choices=["server", "local"],
+        default="server",
+        help="server lets Weaviate vectorize every object; local embeds in large "
+        "batches here, cached on disk by content hash. A collection holds vectors "
+        "of one source only, so upserts must use the one it was created with",
+    )
+    parser.add_argument(
+        "--embedder",
+        choices=["openai", "fake"],
+        default="openai",
+        help="embedder for --vectors local; fake is deterministic and offline",
+    )
+    parser.add_argument("--embed-batch-size", type=int, default=512)
+    parser.add_argument("--vector-cache", default=VECTOR_CACHE_PATH)
+    args = parser.parse_args()
+
+    print(weaviate_url)
+
+    # Setting up client (the factory sends the OpenAI key for the vectorizer)
+    client = get_client()
+
+    try:
+        collection = create_collection(
+            client, recreate=args.mode == "recreate", vectors=args.vectors
+        )
+    except ValueError as error:
+        close_client()
+        parser.exit(1, f"{error}\n")
+    vectorizer = None
+    if args.vectors == "local":
+        vectorizer = LocalVectorizer(
+            create_embedder(args.embedder),
+            VectorCache(args.vector_cache),
+            batch_size=args.embed_batch_size,
+        )
+    if args.source == "parquet":
+        source_path = preprocess(chunksize=args.chunksize)
+        chunks = iter_parquet_chunks(source_path, args.chunksize)
+    else:
+        source_path = MOVIES_PATH
+        chunks = iter_movie_chunks(
+            load_plots(chunksize=args.chunksize), source_path, args.chunksize
+        )
+
+    signature = source_signature(source_path, args.chunksize)
+    checkpoint = None
+    if args.mode == "upsert" and args.resume:
+        checkpoint = read_checkpoint(signature)
+    checkpoint = checkpoint or {"source": signature, "chunks": 0, "rows": 0, "failed": 0}
+    if checkpoint["chunks"]:
+        print(f"Resuming after chunk {checkpoint['chunks']} ({checkpoint['rows']} movies)")
+
+    # Importing the data chunk by chunk, so memory stays flat however large
+    # the dump is. The checkpoint is written only once a chunk is committed.
+    progress = tqdm(unit="movies", initial=checkpoint["rows"])
+    try:
+        with open(ERRORS_PATH, "a") as errors_file:
+            for i, chunk in enumerate(chunks):
+                if i < checkpoint["chunks"]:
+                    continue
+                objects = build_objects(chunk)
+                vectors = vectorizer.vectorize(objects) if vectorizer else None
+                checkpoint["failed"] += import_chunk(
+                    collection, objects, errors_file, vectors
+                )
+                checkpoint["chunks"] = i + 1
+                checkpoint["rows"] += len(chunk)
+                write_checkpoint(checkpoint)
+                progress.update(len(chunk))
+    except BaseException as error:
+        print("Import Failed at: ", checkpoint["rows"])
+        print("An exception occurred: {}".format(error))
+        print("Run again with --mode upsert --resume to continue from the checkpoint")
+        # Stop the import on error
+    finally:
+        progress.close()
+
+    if checkpoint["failed"]:
+        print(f"{checkpoint['failed']} movies failed, see {ERRORS_PATH}")
+    if vectorizer:
+        print(
+            f"Vectors: {vectorizer.embedded} embedded, {vectorizer.cached} from cache"
+        )
+        vectorizer.cache.close()
+
+    close_client()
 
 
-client.close()
+if __name__ == "__main__":
+    main()
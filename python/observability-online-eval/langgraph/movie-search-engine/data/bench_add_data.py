@@ -0,0 +1,126 @@
+"""
+Rows/sec of building Weaviate objects for the movie import, before and after.
+
+Generates synthetic movie_data.csv / wiki_movie_plots_deduped.csv files in a
+temporary directory and times the original per-row ``df.iloc[i]`` loop
+against the chunked, column-wise loader in add_data.py. No Weaviate calls are
+made.
+
+    python bench_add_data.py --rows 200000 --chunksize 10000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from add_data import build_objects, iter_movie_chunks, load_plots
+
+
+def write_dataset(folder: str, rows: int) -> None:
+    rng = np.random.default_rng(0)
+    years = rng.integers(1950, 2024, rows)
+    names = np.array([f"Movie {i % (rows // 2 + 1)}" for i in range(rows)])
+    pd.DataFrame(
+        {
+            "id": np.arange(rows),
+            "Name": names,
+            "PosterLink": "https://example.com/poster.jpg",
+            "Genres": "Drama,Thriller",
+            "Actors": "Some Actor,Another Actor",
+            "Director": "Some Director",
+            "Description": "A description of the movie " * 4,
+            "DatePublished": pd.to_datetime(years.astype(str) + "-06-01"),
+            "Keywords": "keyword one,keyword two",
+        }
+    ).to_csv(os.path.join(folder, "movie_data.csv"), index=False)
+    pd.DataFrame(
+        {
+            "Release Year": years,
+            "Title": names,
+            "Origin/Ethnicity": "American",
+            "Director": "Some Director",
+            "Plot": "A long plot of the movie. " * 40,
+        }
+    ).to_csv(os.path.join(folder, "wiki_movie_plots_deduped.csv"), index=False)
+
+
+def legacy(folder: str) -> int:
+    df = pd.read_csv(
+        os.path.join(folder, "movie_data.csv"),
+        parse_dates=["DatePublished"],
+        on_bad_lines="skip",
+        low_memory=False,
+    )
+    df["year"] = df["DatePublished"].dt.year.fillna(0).astype(int)
+    df.drop(["DatePublished"], axis=1, inplace=True)
+    df = df[df.year > 1970]
+    plots = pd.read_csv(os.path.join(folder, "wiki_movie_plots_deduped.csv"))
+    plots = plots[plots["Release Year"] > 1970]
+    plots = plots[plots.duplicated(subset=["Title", "Release Year", "Plot"]) == False]
+    plots = plots[plots.duplicated(subset=["Title", "Release Year"]) == False]
+    plots = plots[["Title", "Plot", "Release Year"]]
+    plots.columns = ["Name", "Plot", "year"]
+    df = df.merge(plots, on=["Name", "year"], how="left").fillna("")
+    df.reset_index(drop=True, inplace=True)
+
+    data_rows = []
+    for i in range(len(df)):
+        item = df.iloc[i]
+        data_rows.append(
+            {
+                "movie_id": float(item["id"]),
+                "title": str(item["Name"]).lower(),
+                "year": int(item["year"]),
+                "poster_link": str(item["PosterLink"]),
+                "genres": str(item["Genres"]),
+                "actors": str(item["Actors"]).lower(),
+                "director": str(item["Director"]).lower(),
+                "description": str(item["Description"]),
+                "plot": str(item["Plot"]),
+                "keywords": str(item["Keywords"]),
+            }
+        )
+    return len(data_rows)
+
+
+def streaming(folder: str, chunksize: int) -> int:
+    plots = load_plots(os.path.join(folder, "wiki_movie_plots_deduped.csv"))
+    rows = 0
+    for chunk in iter_movie_chunks(
+        plots, os.path.join(folder, "movie_data.csv"), chunksize=chunksize
+    ):
+        rows += len(build_objects(chunk))
+    return rows
+
+
+def measure(name: str, fn, *args) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:<10} {rows:>8} rows  {rows / elapsed:>10.0f} rows/s  "
+        f"peak {peak / 2**20:8.1f} MiB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--chunksize", type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        write_dataset(folder, args.rows)
+        measure("legacy", legacy, folder)
+        measure("streaming", streaming, folder, args.chunksize)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Time and peak memory of the CSV merge stage against the Parquet cache.
+
+Uses the synthetic dataset of bench_add_data.py and reports three paths:
+
+* legacy: two ``duplicated`` passes and a left merge on string keys
+* preprocess: the typed, categorical-key merge written to Parquet (cold cache)
+* parquet: reading the merged movies back from the cache (warm runs)
+
+Peak memory is the tracemalloc peak plus the peak of the Arrow memory pool,
+which tracemalloc does not see.
+
+    python bench_preprocess.py --rows 200000 --chunksize 10000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+import pyarrow as pa
+
+from bench_add_data import write_dataset
+from preprocess import iter_parquet_chunks, preprocess
+
+
+def legacy(folder: str, chunksize: int) -> int:
+    plots = pd.read_csv(
+        os.path.join(folder, "wiki_movie_plots_deduped.csv"),
+        usecols=["Title", "Release Year", "Plot"],
+    )
+    plots = plots[plots["Release Year"] > 1970]
+    plots = plots[plots.duplicated(subset=["Title", "Release Year", "Plot"]) == False]
+    plots = plots[plots.duplicated(subset=["Title", "Release Year"]) == False]
+    plots = plots[["Title", "Plot", "Release Year"]]
+    plots.columns = ["Name", "Plot", "year"]
+    rows = 0
+    for df in pd.read_csv(
+        os.path.join(folder, "movie_data.csv"),
+        on_bad_lines="skip",
+        low_memory=False,
+        chunksize=chunksize,
+    ):
+        published = pd.to_datetime(df["DatePublished"], errors="coerce")
+        df["year"] = published.dt.year.fillna(0).astype(int)
+        df = df.drop(["DatePublished"], axis=1)
+        df = df[df.year > 1970]
+        rows += len(df.merge(plots, on=["Name", "year"], how="left").fillna(""))
+    return rows
+
+
+def cold(folder: str, chunksize: int) -> int:
+    path = preprocess(
+        os.path.join(folder, "movie_data.csv"),
+        os.path.join(folder, "wiki_movie_plots_deduped.csv"),
+        os.path.join(folder, "movies_merged.parquet"),
+        chunksize,
+        force=True,
+    )
+    return sum(len(df) for df in iter_parquet_chunks(path, chunksize))
+
+
+def warm(folder: str, chunksize: int) -> int:
+    path = os.path.join(folder, "movies_merged.parquet")
+    return sum(len(df) for df in iter_parquet_chunks(path, chunksize))
+
+
+def measure(name: str, fn, *args) -> None:
+    pool = pa.default_memory_pool()
+    arrow_base = pool.max_memory() or 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    arrow_peak = max((pool.max_memory() or 0) - arrow_base, 0)
+    print(
+        f"{name:<11} {rows:>8} rows  {elapsed:7.2f} s  "
+        f"peak {peak / 2**20:8.1f} MiB (+{arrow_peak / 2**20:.1f} MiB arrow)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--chunksize", type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        write_dataset(folder, args.rows)
+        measure("legacy", legacy, folder, args.chunksize)
+        measure("preprocess", cold, folder, args.chunksize)
+        measure("parquet", warm, folder, args.chunksize)
+
+
+if __name__ == "__main__":
+    main()
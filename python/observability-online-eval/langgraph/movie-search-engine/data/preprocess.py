@@ -0,0 +1,180 @@
+"""
+Read, dedupe and merge the movie and Wikipedia plot dumps once, into Parquet.
+
+Only the needed columns are read, with explicit dtypes. Plots are read in
+chunks, filtered, deduped and joined to movies on the integer codes of a
+categorical title shared by both frames, plus the year. The merged result is
+written to a Parquet file together with the signature of both sources, so
+later imports skip the CSV stage until a source file changes.
+
+    python preprocess.py --chunksize 10000
+"""
+import argparse
+import json
+import os
+from typing import Iterator, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+MOVIES_PATH = "movie_data.csv"
+PLOTS_PATH = "wiki_movie_plots_deduped.csv"
+PARQUET_PATH = "movies_merged.parquet"
+CHUNK_SIZE = 10_000
+
+MOVIE_DTYPES = {
+    "id": "float64",
+    "Name": "string",
+    "PosterLink": "string",
+    "Genres": "string",
+    "Actors": "string",
+    "Director": "string",
+    "Description": "string",
+    "DatePublished": "string",
+    "Keywords": "string",
+}
+MOVIE_COLUMNS = list(MOVIE_DTYPES)
+PLOT_DTYPES = {"Title": "string", "Release Year": "int32", "Plot": "string"}
+
+
+def load_plots(path: str = PLOTS_PATH, chunksize: int = CHUNK_SIZE) -> pd.DataFrame:
+    """
+    Wikipedia plots since 1970, one per title and year.
+
+    The CSV is read ``chunksize`` rows at a time and every chunk is filtered
+    before it is kept, so only the plots that can match a movie are held in
+    memory. The lookup needs all of those at once, so they are concatenated.
+    """
+    chunks = []
+    for chunk in pd.read_csv(
+        path, usecols=list(PLOT_DTYPES), dtype=PLOT_DTYPES, chunksize=chunksize
+    ):
+        chunk = chunk[chunk["Release Year"] > 1970].dropna(subset=["Title"])
+        chunks.append(chunk.drop_duplicates(subset=["Title", "Release Year"]))
+    plots = pd.concat(chunks, ignore_index=True)
+    # Keeping the first plot per title and year also drops exact duplicates,
+    # including those split across chunks.
+    plots = plots.drop_duplicates(subset=["Title", "Release Year"])
+    plots = plots[["Title", "Plot", "Release Year"]]
+    plots.columns = ["Name", "Plot", "year"]
+    plots["Name"] = plots["Name"].astype("category")
+    return plots
+
+
+def merge_plots(df: pd.DataFrame, plots: pd.DataFrame) -> pd.Series:
+    """
+    Plot of every movie in ``df``, looked up by title code and year.
+
+    Equivalent to a left merge on ``["Name", "year"]``, but the titles are
+    encoded against the categories of ``plots["Name"]`` so the join runs on a
+    single int64 key instead of two object columns.
+    """
+    names = plots["Name"].dtype
+    plot_keys = plots["Name"].cat.codes.astype("int64") * 10_000 + plots["year"]
+    movie_codes = df["Name"].astype(names).cat.codes.astype("int64")
+    movie_keys = movie_codes * 10_000 + df["year"]
+    # Titles unknown to the plots get code -1, which matches no plot key.
+    movie_keys = movie_keys.where(movie_codes >= 0, -1)
+    plot_by_key = pd.Series(plots["Plot"].to_numpy(), index=plot_keys.to_numpy())
+    return movie_keys.map(plot_by_key)
+
+
+def iter_movie_chunks(
+    plots: pd.DataFrame, path: str = MOVIES_PATH, chunksize: int = CHUNK_SIZE
+) -> Iterator[pd.DataFrame]:
+    """Read movies since 1970 in chunks, each merged with its plots."""
+    for df in pd.read_csv(
+        path,
+        usecols=MOVIE_COLUMNS,
+        dtype=MOVIE_DTYPES,
+        on_bad_lines="skip",
+        skip_blank_lines=True,
+        chunksize=chunksize,
+    ):
+        published = pd.to_datetime(df["DatePublished"], errors="coerce")
+        df["year"] = published.dt.year.fillna(0).astype(int)
+        df = df.drop(["DatePublished"], axis=1)
+        df = df[df.year > 1970].copy()
+        df["Plot"] = merge_plots(df, plots)
+        yield df.fillna("")
+
+
+def source_signatures(movies_path: str, plots_path: str) -> dict:
+    signatures = {}
+    for path in (movies_path, plots_path):
+        stat = os.stat(path)
+        signatures[os.path.basename(path)] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+    return signatures
+
+
+def cached_signatures(parquet_path: str) -> Optional[dict]:
+    if not os.path.exists(parquet_path):
+        return None
+    metadata = pq.read_schema(parquet_path).metadata or {}
+    raw = metadata.get(b"sources")
+    return json.loads(raw) if raw else None
+
+
+def preprocess(
+    movies_path: str = MOVIES_PATH,
+    plots_path: str = PLOTS_PATH,
+    parquet_path: str = PARQUET_PATH,
+    chunksize: int = CHUNK_SIZE,
+    force: bool = False,
+) -> str:
+    """
+    Write the merged movies to ``parquet_path`` unless an up-to-date copy exists.
+
+    Returns the Parquet path.
+    """
+    signatures = source_signatures(movies_path, plots_path)
+    if not force and cached_signatures(parquet_path) == signatures:
+        return parquet_path
+
+    plots = load_plots(plots_path, chunksize)
+    tmp_path = parquet_path + ".tmp"
+    writer = None
+    try:
+        for df in iter_movie_chunks(plots, movies_path, chunksize):
+            df = df.astype({"year": "int64", "Plot": "string"})
+            if writer is None:
+                schema = pa.Schema.from_pandas(df, preserve_index=False)
+                schema = schema.with_metadata(
+                    {**(schema.metadata or {}), b"sources": json.dumps(signatures)}
+                )
+                writer = pq.ParquetWriter(tmp_path, schema)
+            writer.write_table(
+                pa.Table.from_pandas(df, schema=writer.schema, preserve_index=False)
+            )
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise ValueError(f"No movies since 1970 in {movies_path}")
+    os.replace(tmp_path, parquet_path)
+    return parquet_path
+
+
+def iter_parquet_chunks(
+    path: str = PARQUET_PATH, chunksize: int = CHUNK_SIZE
+) -> Iterator[pd.DataFrame]:
+    """Read the merged movies back in batches of ``chunksize`` rows."""
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+        yield batch.to_pandas()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the merged movies Parquet cache.")
+    parser.add_argument("--movies", default=MOVIES_PATH)
+    parser.add_argument("--plots", default=PLOTS_PATH)
+    parser.add_argument("--output", default=PARQUET_PATH)
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+
+    path = preprocess(args.movies, args.plots, args.output, args.chunksize, args.force)
+    print(f"{pq.ParquetFile(path).metadata.num_rows} movies in {path}")
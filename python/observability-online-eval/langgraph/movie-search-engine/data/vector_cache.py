@@ -0,0 +1,146 @@
+import hashlib
+import sqlite3
+from array import array
+from typing import Dict, List, Optional, Protocol, Sequence
+
+import numpy as np
+
+# Properties the collection vectorizes (every other property sets
+# skip_vectorization=True). The server vectorizer builds a different text
+# from them, which is why add_data.py never mixes local and server vectors
+# in one collection.
+VECTORIZED_FIELDS = ["description", "plot", "keywords"]
+
+
+class Embedder(Protocol):
+    def embed_documents(self, texts: List[str]) -> List[List[float]]: ...
+
+
+class HashEmbedder:
+    """Deterministic offline embedder: the same text always maps to the same unit vector."""
+
+    model = "sha256-gaussian"
+
+    def __init__(self, dimensions: int = 1536) -> None:
+        self.dimensions = dimensions
+        self.calls = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+            vector = np.random.default_rng(seed).standard_normal(self.dimensions)
+            vectors.append((vector / np.linalg.norm(vector)).tolist())
+        return vectors
+
+
+def vector_text(movie_object: dict) -> str:
+    return "\n".join(str(movie_object[field]) for field in VECTORIZED_FIELDS)
+
+
+def content_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class VectorCache:
+    """
+    On-disk map from the hash of a movie's vectorized text to its vector.
+
+    Vectors are stored per embedding model and dimension, so vectors of one
+    embedder (e.g. the offline :class:`HashEmbedder`) are never served to a
+    run that uses another.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT, dimensions INTEGER, key TEXT, vector BLOB, "
+            "PRIMARY KEY (model, dimensions, key))"
+        )
+
+    def get_many(self, model: str, dimensions: int, keys: Sequence[str]) -> Dict[str, List[float]]:
+        found = {}
+        # SQLite limits the number of bound parameters per statement.
+        for start in range(0, len(keys), 900):
+            part = list(keys[start : start + 900])
+            rows = self.connection.execute(
+                "SELECT key, vector FROM embeddings WHERE model = ? AND dimensions = ? "
+                f"AND key IN ({','.join('?' * len(part))})",
+                [model, dimensions] + part,
+            )
+            for key, blob in rows:
+                found[key] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, model: str, dimensions: int, items: Dict[str, List[float]]) -> None:
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)",
+            [
+                (model, dimensions, key, array("f", vector).tobytes())
+                for key, vector in items.items()
+            ],
+        )
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class LocalVectorizer:
+    """
+    Computes movie vectors client-side in large batches, reusing cached ones.
+
+    Only movies whose vectorized text is not in the cache are sent to the
+    embedder, so re-importing unchanged movies makes no embedding calls.
+
+    Args:
+        embedder: Anything with ``embed_documents``, e.g. ``OpenAIEmbeddings``
+            or :class:`HashEmbedder` for offline runs.
+        cache: Disk cache of vectors.
+        batch_size: Number of texts per ``embed_documents`` call.
+        model: Name the cached vectors are stored under; defaults to the
+            embedder's ``model``.
+        dimensions: Length of the vectors; defaults to the embedder's
+            ``dimensions``.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        cache: VectorCache,
+        batch_size: int = 512,
+        model: Optional[str] = None,
+        dimensions: Optional[int] = None,
+    ) -> None:
+        self.embedder = embedder
+        self.cache = cache
+        self.batch_size = batch_size
+        self.model = model or getattr(embedder, "model", None)
+        self.dimensions = dimensions or getattr(embedder, "dimensions", None)
+        if not self.model or not self.dimensions:
+            raise ValueError("The embedding model and dimensions are needed to key the cache")
+        self.cached = 0
+        self.embedded = 0
+
+    def vectorize(self, objects: List[dict]) -> List[List[float]]:
+        texts = [vector_text(o) for o in objects]
+        keys = [content_key(t) for t in texts]
+        vectors = self.cache.get_many(self.model, self.dimensions, list(dict.fromkeys(keys)))
+        missing = {k: t for k, t in zip(keys, texts) if k not in vectors}
+        self.cached += len(vectors)
+
+        missing_keys = list(missing)
+        for start in range(0, len(missing_keys), self.batch_size):
+            batch_keys = missing_keys[start : start + self.batch_size]
+            embedded = self.embedder.embed_documents([missing[k] for k in batch_keys])
+            if any(len(vector) != self.dimensions for vector in embedded):
+                raise ValueError(
+                    f"{self.model} returned vectors that are not {self.dimensions}-dimensional"
+                )
+            new_vectors = dict(zip(batch_keys, embedded))
+            self.cache.put_many(self.model, self.dimensions, new_vectors)
+            vectors.update(new_vectors)
+            self.embedded += len(batch_keys)
+        return [vectors[k] for k in keys]
@@ -1,19 +1,24 @@
+import asyncio
 import json
 import logging
 import os
+import sys
 import time
 from functools import lru_cache
-from typing import Annotated, List, Literal, Sequence, Tuple, TypedDict, Union
+from typing import (Annotated, List, Literal, Optional, Sequence, Tuple,
+                    TypedDict, Union)
 from uuid import uuid4
 
+# node_metrics.py is shared with the multi-agent app, one directory up.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import dotenv
-import weaviate
 from flask import Flask, jsonify, request
-from langchain.tools.retriever import create_retriever_tool
 from langchain_anthropic import ChatAnthropic
 from langchain_community.tools.tavily_search import TavilySearchResults
 from langchain_core.messages import (BaseMessage,
                                      ToolMessage)
+from langchain_core.tools import tool
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_weaviate import WeaviateVectorStore
 from langgraph.graph import END, START, StateGraph, add_messages
@@ -22,15 +27,25 @@ from maxim import Config, Maxim
 from maxim.decorators import current_trace, trace
 from maxim.decorators.langchain import langchain_callback, langgraph_agent
 from maxim.logger import LoggerConfig
+from weaviate.classes.query import MetadataQuery
+
+from message_window import MessageWindow
+from node_metrics import metrics, node_metrics_callback
+from semantic_cache import SemanticCache
+from speculation import SpeculationStats, speculate
+from weaviate_client import get_client, is_ready
 
 dotenv.load_dotenv()
 
 # Environment variables
-weaviate_url = os.environ.get("WEAVIATE_URL", "")
-weaviate_key = os.environ.get("WEAVIATE_API_KEY", "")
 openai_key = os.environ.get("OPENAI_API_KEY", "")
 anthropic_api_key = os.environ.get("ANTHROPIC_API_KEY", "")
 tavily_api_key = os.environ.get("TAVILY_API_KEY", "")
+# Run the database retrieval and the web search together on the first tool call
+speculative_search = os.environ.get("SPECULATIVE_SEARCH", "").lower() in ("1", "true", "yes")
+# Cosine distance the best database hit must be within for speculation to
+# keep it and drop the web search
+speculative_max_distance = float(os.environ.get("SPECULATIVE_MAX_DISTANCE", "0.5"))
 
 maxim_api_key = os.environ.get("MAXIM_API_KEY", "")
 maxim_base_url = os.environ.get("MAXIM_BASE_URL", "")
@@ -40,37 +55,74 @@ logger = Maxim(
     Config(api_key=maxim_api_key, debug=True, base_url=maxim_base_url)
 ).logger(LoggerConfig(id=maxim_repo_id))
 
-# Initialize Weaviate client
-client = weaviate.connect_to_weaviate_cloud(
-    cluster_url=weaviate_url,
-    auth_credentials=weaviate.auth.AuthApiKey(api_key=weaviate_key),
-    skip_init_checks=True,
-)
+embeddings = OpenAIEmbeddings(api_key=openai_key, model="text-embedding-3-small")
 
-# Initialize vector store and retriever
-vector_store = WeaviateVectorStore(
-    client=client,
-    index_name="Awesome_moviate_movies",
-    text_key="title",
-    embedding=OpenAIEmbeddings(api_key=openai_key, model="text-embedding-3-small"),
-    attributes=[
-        "title",
-        "description",
-        "Plot",
-        "keywords",
-        "genres",
-        "actors",
-        "director",
-    ],
+# Answers of recent queries, reused for near-duplicate questions
+semantic_cache = SemanticCache(
+    embeddings,
+    threshold=float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+    maxsize=int(os.environ.get("SEMANTIC_CACHE_SIZE", "1024")),
+    ttl=float(os.environ.get("SEMANTIC_CACHE_TTL", "3600")),
 )
-retriever = vector_store.as_retriever()
+
+
+collection_name = "Awesome_moviate_movies"
+
+
+@lru_cache(maxsize=1)
+def get_vector_store() -> WeaviateVectorStore:
+    """Vector store on the shared Weaviate client, built on first use."""
+    return WeaviateVectorStore(
+        client=get_client(),
+        index_name=collection_name,
+        text_key="title",
+        embedding=embeddings,
+        attributes=[
+            "title",
+            "description",
+            "Plot",
+            "keywords",
+            "genres",
+            "actors",
+            "director",
+        ],
+    )
+
 
 # Create tools
-retriever_tool = create_retriever_tool(
-    retriever,
-    "search_movies",
-    "Search for information about movies in the database.",
-)
+@tool("search_movies")
+def retriever_tool(query: str) -> str:
+    """Search for information about movies in the database."""
+    docs = get_vector_store().as_retriever().invoke(query)
+    return "\n\n".join(doc.page_content for doc in docs)
+
+
+async def search_movies_with_distance(query: str, k: int = 4) -> Tuple[str, Optional[float]]:
+    """
+    Titles of the nearest movies and the cosine distance of the best one.
+
+    The vector store only exposes hybrid scores, which are normalised per
+    query (the top hit always scores 1), so the distance comes from a plain
+    near-vector query.
+    """
+    vector = await embeddings.aembed_query(query)
+    collection = get_client().collections.get(collection_name)
+    response = await asyncio.to_thread(
+        collection.query.near_vector,
+        near_vector=vector,
+        limit=k,
+        return_properties=["title"],
+        return_metadata=MetadataQuery(distance=True),
+    )
+    titles = "\n\n".join(str(o.properties.get("title", "")) for o in response.objects)
+    distances = [o.metadata.distance for o in response.objects if o.metadata.distance is not None]
+    return titles, min(distances) if distances else None
+
+
+def is_relevant(result: Tuple[str, Optional[float]]) -> bool:
+    _, distance = result
+    return distance is not None and distance <= speculative_max_distance
+
 
 tavily_tool = TavilySearchResults(max_results=3, tavily_api_key=tavily_api_key)
 
@@ -106,7 +158,7 @@ def should_continue(state: AgentState) -> str:
 
     if not retriever_tried:
         # First try the movie database retriever
-        return "retrieve"
+        return "speculate" if speculative_search else "retrieve"
 
     last_message = messages[-1]
     # Check if we need to use Tavily search
@@ -126,33 +178,35 @@ system_prompt = """You are a helpful movie information assistant. You have searc
     Priorotise database search but if you need to do a general search, use tavily search. Make sure your answer is valid irrespective of the search.    
     Always provide clear, concise answers."""
 
+# System message and history trimmed to the prompt token budget
+message_window = MessageWindow(
+    system_prompt, max_tokens=int(os.environ.get("MESSAGE_WINDOW_TOKENS", "6000"))
+)
+
 
-def call_model(state: AgentState, config: dict) -> dict:
+async def call_model(state: AgentState, config: dict) -> dict:
     """Call the LLM with the current state."""
     messages = state["messages"]
     model_name = config.get("configurable", {}).get("model_name", "openai")
     model = get_model(model_name)
 
-    # Add system prompt
-    system_prompt = """You are a helpful movie information assistant. You have search_movie and tavily search tools.
-    Priorotise database search but if you need to do a general search, use tavily search. Make sure your answer is valid irrespective of the search.    
-    Always provide clear, concise answers."""
-
     # Prepare messages
-    formatted_messages = [{"role": "system", "content": system_prompt}] + messages
+    formatted_messages = message_window.format(messages)
 
-    response = model.invoke(formatted_messages)
+    start = time.perf_counter()
+    response = await model.ainvoke(formatted_messages)
+    speculation_stats.record_model_call(time.perf_counter() - start)
     return {"messages": [response]}
 
 
-def run_retriever(state: AgentState) -> dict:
+async def run_retriever(state: AgentState) -> dict:
     """Execute the movie database retrieval."""
     messages = state["messages"]
     last_message = messages[-1]
     tool_call_id = last_message.tool_calls[0]["id"]
     try:
 
-        results = retriever_tool.invoke(
+        results = await retriever_tool.ainvoke(
             input=str(last_message.tool_calls[0]["args"]["query"])
         )
         if not results:
@@ -187,13 +241,13 @@ def run_retriever(state: AgentState) -> dict:
         }
 
 
-def run_search(state: AgentState) -> dict:
+async def run_search(state: AgentState) -> dict:
     """Execute the Tavily search."""
     messages = state["messages"]
     last_message = messages[-1]
     tool_call_id = last_message.tool_calls[0]["id"]
     try:
-        results = tavily_tool.invoke(
+        results = await tavily_tool.ainvoke(
             input=str(last_message.tool_calls[0]["args"]["query"])
         )
         return {
@@ -216,6 +270,39 @@ def run_search(state: AgentState) -> dict:
         }
 
 
+speculation_stats = SpeculationStats()
+
+
+async def run_speculative(state: AgentState) -> dict:
+    """Query the movie database and Tavily concurrently, preferring the database."""
+    last_message = state["messages"][-1]
+    tool_call_id = last_message.tool_calls[0]["id"]
+    query = str(last_message.tool_calls[0]["args"]["query"])
+    try:
+        source, results, overlap = await speculate(
+            lambda: search_movies_with_distance(query),
+            lambda: tavily_tool.ainvoke(input=query),
+            is_good=is_relevant,
+            stats=speculation_stats,
+        )
+    except Exception as e:
+        logging.error(f"Speculative search error: {e}")
+        content = "Sorry, I couldn't find any relevant information."
+    else:
+        speculation_stats.record(source, overlap)
+        if source == "database":
+            content = f"Found in movie database: {results[0]}"
+        else:
+            content = (
+                "No relevant information found in the movie database. "
+                f"Found from general search: {results}"
+            )
+    return {
+        "messages": [ToolMessage(tool_call_id=tool_call_id, content=content)],
+        "retriever_tried": True,
+    }
+
+
 # Create the workflow graph
 workflow = StateGraph(AgentState)
 
@@ -223,18 +310,22 @@ workflow = StateGraph(AgentState)
 workflow.add_node("agent", call_model)
 workflow.add_node("retrieve", run_retriever)
 workflow.add_node("search", run_search)
+workflow.add_node("speculate", run_speculative)
 
 # Set entry point
 workflow.set_entry_point("agent")
 
 # Add edges with conditions
 workflow.add_conditional_edges(
-    "agent", should_continue, {"retrieve": "retrieve", "search": "search", "end": END}
+    "agent",
+    should_continue,
+    {"retrieve": "retrieve", "search": "search", "speculate": "speculate", "end": END},
 )
 
 # Add return edges to agent
 workflow.add_edge("retrieve", "agent")
 workflow.add_edge("search", "agent")
+workflow.add_edge("speculate", "agent")
 
 # Compile the workflow
 app = workflow.compile()
@@ -246,7 +337,7 @@ eval_config = {
 }
 @langgraph_agent(name="movie-agent-v1",eval_config=eval_config)
 async def ask_agent(initial_state: dict, query: str) -> str:
-    config = {"callbacks": [langchain_callback()]}
+    config = {"callbacks": [langchain_callback(), node_metrics_callback()]}
     response = None
     async for event in app.astream(input=initial_state, config=config):
         for k, v in event.items():
@@ -255,6 +346,28 @@ async def ask_agent(initial_state: dict, query: str) -> str:
     return response
 
 
+@flask_app.get("/health")
+def health():
+    ready = is_ready()
+    return jsonify({"weaviate": ready}), 200 if ready else 503
+
+
+@flask_app.get("/cache/stats")
+def cache_stats():
+    return jsonify(
+        {
+            "semantic_cache": semantic_cache.stats(),
+            "speculation": speculation_stats.stats(),
+            "message_window": message_window.stats(),
+        }
+    )
+
+
+@flask_app.get("/metrics")
+def metrics_endpoint():
+    return jsonify(metrics.snapshot())
+
+
 @flask_app.post("/chat")
 @trace(logger=logger, name="movie-search-v1")
 async def chat():
@@ -264,7 +377,12 @@ async def chat():
             "messages": query,
             "retriever_tried": False,
         }
-        response = await ask_agent(initial_state, query)
+        vector = await semantic_cache.aembed(query)
+        response = semantic_cache.lookup(vector)
+        if response is None:
+            response = await ask_agent(initial_state, query)
+            if response is not None:
+                semantic_cache.put(vector, query, response)
         current_trace().set_input(query)
         current_trace().set_output(str(response))
         
@@ -274,6 +392,8 @@ async def chat():
         return jsonify({"error": str(e)}), 500
 
 
-print(app.get_graph().draw_mermaid())
+if __name__ == "__main__":
+    print(app.get_graph().draw_mermaid())
+
+    flask_app.run(port=8000)
 
-flask_app.run(port=8000)
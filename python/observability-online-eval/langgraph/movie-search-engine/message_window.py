@@ -0,0 +1,159 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import List, Sequence, Tuple
+
+import tiktoken
+from langchain_core.messages import (AIMessage, BaseMessage, HumanMessage,
+                                     SystemMessage, ToolMessage)
+
+# Tokens added per message by the chat format (role, separators).
+MESSAGE_OVERHEAD = 4
+
+
+class MessageWindow:
+    """
+    Builds the prompt of every model call: a cached system message followed by
+    the most recent history that fits in ``max_tokens``.
+
+    Token counts are computed once per message and cached by message id, so a
+    call only encodes the messages added since the previous one.
+
+    History is trimmed in units that keep the prompt valid: an ``AIMessage``
+    is kept or dropped together with the ``ToolMessage`` replies to its tool
+    calls. The current turn (from the latest ``HumanMessage`` on) is sent
+    whole when it fits, and older turns are added whole, newest first, while
+    they fit. When the current turn alone is over budget, its question and
+    latest step are still sent, preceded by as many of its most recent steps
+    as fit.
+
+    Args:
+        system_prompt: Content of the system message.
+        max_tokens: Token budget of the whole prompt, system message included.
+        model: Model whose tokenizer is used for counting.
+        cache_size: Number of per-message counts kept.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        max_tokens: int = 6000,
+        model: str = "gpt-4",
+        cache_size: int = 10_000,
+    ) -> None:
+        try:
+            self.encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            self.encoding = tiktoken.get_encoding("cl100k_base")
+        self.system_message = SystemMessage(content=system_prompt)
+        self.max_tokens = max_tokens
+        self.cache_size = cache_size
+        self.system_tokens = self._encode(self.system_message)
+        self.turns = 0
+        self.full_tokens = 0
+        self.window_tokens = 0
+        self._counts: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _encode(self, message: BaseMessage) -> int:
+        content = message.content
+        if not isinstance(content, str):
+            content = json.dumps(content, default=str)
+        tokens = MESSAGE_OVERHEAD + len(self.encoding.encode(content))
+        tool_calls = getattr(message, "tool_calls", None)
+        if tool_calls:
+            tokens += len(self.encoding.encode(json.dumps(tool_calls, default=str)))
+        return tokens
+
+    def count(self, message: BaseMessage) -> int:
+        if message.id is None:
+            return self._encode(message)
+        with self._lock:
+            tokens = self._counts.get(message.id)
+            if tokens is not None:
+                self._counts.move_to_end(message.id)
+                return tokens
+        tokens = self._encode(message)
+        with self._lock:
+            self._counts[message.id] = tokens
+            while len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+        return tokens
+
+    @staticmethod
+    def _steps(messages: Sequence[BaseMessage]) -> List[Tuple[int, int]]:
+        """
+        Split ``messages`` into ``(start, end)`` ranges: an ``AIMessage`` with
+        the ``ToolMessage`` replies that follow it, or any other message alone.
+        """
+        steps: List[Tuple[int, int]] = []
+        for i, message in enumerate(messages):
+            if (
+                isinstance(message, ToolMessage)
+                and steps
+                and steps[-1][1] == i
+                and isinstance(messages[steps[-1][0]], AIMessage)
+            ):
+                steps[-1] = (steps[-1][0], i + 1)
+            else:
+                steps.append((i, i + 1))
+        return steps
+
+    def trim(self, messages: Sequence[BaseMessage]) -> Tuple[List[BaseMessage], int, int]:
+        """
+        Return the newest messages that fit the budget, with the token count of
+        the full and of the trimmed prompt.
+        """
+        counts = [self.count(m) for m in messages]
+        full = self.system_tokens + sum(counts)
+        budget = self.max_tokens - self.system_tokens
+        steps = self._steps(messages)
+        if not steps:
+            return [], full, self.system_tokens
+        sizes = [sum(counts[start:end]) for start, end in steps]
+        questions = [
+            i for i, (start, _) in enumerate(steps) if isinstance(messages[start], HumanMessage)
+        ]
+        turn = questions[-1] if questions else 0
+        last = len(steps) - 1
+
+        # The question and the latest step are always sent, even over budget.
+        used = sizes[turn] + (sizes[last] if last > turn else 0)
+        first = last if last > turn else last + 1
+        while first - 1 > turn and used + sizes[first - 1] <= budget:
+            first -= 1
+            used += sizes[first]
+        if first > turn + 1:
+            kept = [turn] + list(range(first, len(steps)))
+        else:
+            start = turn
+            turn_starts = sorted({0, *questions})
+            for previous in reversed([t for t in turn_starts if t < turn]):
+                size = sum(sizes[previous:start])
+                if used + size > budget:
+                    break
+                used += size
+                start = previous
+            kept = list(range(start, len(steps)))
+
+        window = [m for i in kept for m in messages[steps[i][0] : steps[i][1]]]
+        return window, full, self.system_tokens + used
+
+    def format(self, messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+        """Prompt for the model: the system message and the trimmed history."""
+        window, full, tokens = self.trim(messages)
+        with self._lock:
+            self.turns += 1
+            self.full_tokens += full
+            self.window_tokens += tokens
+        return [self.system_message] + window
+
+    def stats(self) -> dict:
+        saved = self.full_tokens - self.window_tokens
+        return {
+            "turns": self.turns,
+            "prompt_tokens": self.window_tokens,
+            "tokens_saved": saved,
+            "tokens_saved_per_turn": saved / self.turns if self.turns else 0.0,
+            "max_tokens": self.max_tokens,
+        }
@@ -0,0 +1,104 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Answers of recently asked queries, looked up by embedding similarity.
+
+    Query vectors are normalized and kept in a preallocated in-memory matrix,
+    so a lookup is one matrix-vector product over at most ``maxsize`` rows.
+    A query hits when its cosine similarity to a live entry reaches
+    ``threshold``. Entries expire after ``ttl`` seconds; when the cache is full
+    the least recently used entry is replaced.
+
+    Args:
+        embeddings: LangChain embeddings used for ``embed``/``aembed``.
+        threshold: Minimum cosine similarity for a hit.
+        maxsize: Maximum number of cached answers.
+        ttl: Lifetime of an answer in seconds.
+    """
+
+    def __init__(
+        self,
+        embeddings: Any,
+        threshold: float = 0.92,
+        maxsize: int = 1024,
+        ttl: float = 3600,
+    ) -> None:
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._expires = np.full(maxsize, -np.inf)
+        self._used = np.zeros(maxsize)
+        self._queries: List[Optional[str]] = [None] * maxsize
+        self._answers: List[Optional[str]] = [None] * maxsize
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def embed(self, query: str) -> np.ndarray:
+        return self._normalize(self.embeddings.embed_query(query))
+
+    async def aembed(self, query: str) -> np.ndarray:
+        return self._normalize(await self.embeddings.aembed_query(query))
+
+    def lookup(self, vector: np.ndarray) -> Optional[str]:
+        """Cached answer of the most similar live query, if similar enough."""
+        with self._lock:
+            now = time.monotonic()
+            if self._vectors is not None:
+                live = self._expires > now
+                if live.any():
+                    scores = np.where(live, self._vectors @ vector, -np.inf)
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.threshold:
+                        self._used[best] = now
+                        self.hits += 1
+                        return self._answers[best]
+            self.misses += 1
+            return None
+
+    def put(self, vector: np.ndarray, query: str, answer: str) -> None:
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.maxsize, vector.shape[0]), dtype=np.float32)
+            now = time.monotonic()
+            expired = np.flatnonzero(self._expires <= now)
+            slot = int(expired[0]) if len(expired) else int(np.argmin(self._used))
+            self._vectors[slot] = vector
+            self._expires[slot] = now + self.ttl
+            self._used[slot] = now
+            self._queries[slot] = query
+            self._answers[slot] = answer
+
+    def clear(self) -> None:
+        with self._lock:
+            self._expires[:] = -np.inf
+            self._queries = [None] * self.maxsize
+            self._answers = [None] * self.maxsize
+
+    def __len__(self) -> int:
+        return int((self._expires > time.monotonic()).sum())
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "threshold": self.threshold,
+        }
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class SpeculationStats:
+    """
+    Outcomes of speculative retrieval and the latency it saved.
+
+    On a database miss the sequential graph would have run another model
+    round and then the web search, so the saving is the average model-call
+    latency plus the part of the search that overlapped the retrieval.
+    """
+
+    def __init__(self) -> None:
+        self.database = 0
+        self.web = 0
+        self.retrieve_errors = 0
+        self.saved_seconds = 0.0
+        self.model_calls = 0
+        self.model_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record_model_call(self, seconds: float) -> None:
+        with self._lock:
+            self.model_calls += 1
+            self.model_seconds += seconds
+
+    def record_retrieve_error(self) -> None:
+        with self._lock:
+            self.retrieve_errors += 1
+
+    @property
+    def average_model_seconds(self) -> float:
+        return self.model_seconds / self.model_calls if self.model_calls else 0.0
+
+    def record(self, source: str, overlap_seconds: float) -> None:
+        with self._lock:
+            if source == "database":
+                self.database += 1
+            else:
+                self.web += 1
+                self.saved_seconds += overlap_seconds + self.average_model_seconds
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.database + self.web
+        return {
+            "database": self.database,
+            "web": self.web,
+            "retrieve_errors": self.retrieve_errors,
+            "database_rate": self.database / total if total else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+            "average_model_seconds": round(self.average_model_seconds, 3),
+        }
+
+
+async def speculate(
+    retrieve: Callable[[], Awaitable[Any]],
+    search: Callable[[], Awaitable[Any]],
+    is_good: Callable[[Any], bool],
+    stats: Optional[SpeculationStats] = None,
+) -> Tuple[str, Any, float]:
+    """
+    Run ``retrieve`` and ``search`` together and prefer the retrieval.
+
+    The search is cancelled as soon as the retrieval is good enough according
+    to ``is_good``. A failed retrieval is logged, counted in ``stats`` and
+    treated as not good.
+
+    Returns the source used (``"database"`` or ``"web"``), its result and the
+    seconds the search ran concurrently with the retrieval.
+    """
+    start = time.perf_counter()
+    searched_at = []
+
+    async def timed_search() -> Any:
+        try:
+            return await search()
+        finally:
+            searched_at.append(time.perf_counter())
+
+    search_task = asyncio.ensure_future(timed_search())
+    try:
+        result = await retrieve()
+    except Exception as e:
+        logging.error(f"Speculative retrieval error: {e}")
+        if stats is not None:
+            stats.record_retrieve_error()
+        result = None
+    retrieved_at = time.perf_counter()
+    if result is not None and is_good(result):
+        search_task.cancel()
+        return "database", result, 0.0
+    result = await search_task
+    overlap = min(retrieved_at, searched_at[0]) - start
+    return "web", result, overlap
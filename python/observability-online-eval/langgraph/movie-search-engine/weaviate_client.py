@@ -0,0 +1,86 @@
+"""
+Shared Weaviate client for the movie-search service and its scripts.
+
+The client is created on first use instead of at import time, so importing
+the service does not block on a remote handshake, and every caller in the
+process shares it (and its HTTP connection pool) instead of opening its own.
+It is closed at interpreter exit.
+
+Pool sizes and timeouts come from the environment:
+
+* WEAVIATE_POOL_CONNECTIONS / WEAVIATE_POOL_MAXSIZE: HTTP connection pool.
+  gRPC queries share one multiplexed HTTP/2 channel, so concurrent requests
+  do not queue behind each other there.
+* WEAVIATE_TIMEOUT_INIT / WEAVIATE_TIMEOUT_QUERY / WEAVIATE_TIMEOUT_INSERT:
+  seconds.
+"""
+import atexit
+import logging
+import os
+import threading
+from typing import Optional
+
+import dotenv
+import weaviate
+from weaviate.classes.init import Auth
+from weaviate.config import AdditionalConfig, ConnectionConfig, Timeout
+
+dotenv.load_dotenv()
+
+weaviate_url = os.environ.get("WEAVIATE_URL", "")
+weaviate_key = os.environ.get("WEAVIATE_API_KEY", "")
+openai_key = os.environ.get("OPENAI_API_KEY", "")
+
+_client: Optional[weaviate.WeaviateClient] = None
+_lock = threading.Lock()
+
+
+def _additional_config() -> AdditionalConfig:
+    return AdditionalConfig(
+        connection=ConnectionConfig(
+            session_pool_connections=int(os.environ.get("WEAVIATE_POOL_CONNECTIONS", "20")),
+            session_pool_maxsize=int(os.environ.get("WEAVIATE_POOL_MAXSIZE", "100")),
+        ),
+        timeout=Timeout(
+            init=int(os.environ.get("WEAVIATE_TIMEOUT_INIT", "10")),
+            query=int(os.environ.get("WEAVIATE_TIMEOUT_QUERY", "30")),
+            insert=int(os.environ.get("WEAVIATE_TIMEOUT_INSERT", "120")),
+        ),
+    )
+
+
+def get_client() -> weaviate.WeaviateClient:
+    """Return the shared client, connecting on the first call."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                headers = {"X-OpenAI-Api-Key": openai_key} if openai_key else None
+                _client = weaviate.connect_to_weaviate_cloud(
+                    cluster_url=weaviate_url,
+                    auth_credentials=Auth.api_key(weaviate_key),
+                    headers=headers,
+                    additional_config=_additional_config(),
+                    skip_init_checks=True,
+                )
+    return _client
+
+
+def is_ready() -> bool:
+    """Health check: whether the cluster answers, without raising."""
+    try:
+        return get_client().is_ready()
+    except Exception as e:
+        logging.error(f"Weaviate health check failed: {e}")
+        return False
+
+
+def close_client() -> None:
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+atexit.register(close_client)
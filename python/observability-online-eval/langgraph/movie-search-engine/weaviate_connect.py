@@ -1,19 +1,7 @@
-import weaviate
-from weaviate.classes.init import Auth
-import os
-from dotenv import load_dotenv
+from weaviate_client import get_client, is_ready
 
-load_dotenv()
+# Credentials, pool sizes and timeouts are read from the environment by the
+# shared client factory.
+client = get_client()
 
-# Best practice: store your credentials in environment variables
-weaviate_url = os.environ.get("WEAVIATE_URL", "")
-weaviate_key = os.environ.get("WEAVIATE_API_KEY", "")
-
-# Connect to Weaviate Cloud
-client = weaviate.connect_to_weaviate_cloud(
-    cluster_url=weaviate_url,
-    auth_credentials=Auth.api_key(weaviate_key),
-    skip_init_checks=True
-)
-
-print(client.is_ready())
\ No newline at end of file
+print(is_ready())
@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import sys
+from typing import Any, AsyncIterator, Callable, List, Optional
+
+# node_metrics.py is shared with the movie-search app, one directory up.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from node_metrics import metrics, node_metrics_callback
+
+
+def sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def create_app(
+    graph,
+    callbacks_factory: Optional[Callable[[], List[Any]]] = None,
+    cache_stats: Optional[Callable[[], dict]] = None,
+) -> Starlette:
+    """
+    ASGI variant of the multi-agent /chat endpoint.
+
+    The graph is driven with ``astream`` on the server's event loop and every
+    node update is sent to the client as a Server-Sent Event as soon as it is
+    produced, followed by the final answer. The supervisor, worker and agent
+    nodes have async variants that await their model calls, so concurrent
+    requests share the loop instead of each holding a thread; only tools
+    without an async implementation still run in LangGraph's thread pool.
+
+    Args:
+        graph: Compiled multi-agent graph.
+        callbacks_factory: Returns the LangChain callbacks for one request.
+        cache_stats: Returns the cache statistics served at /cache/stats.
+    """
+
+    async def events(query: str) -> AsyncIterator[str]:
+        config = {"callbacks": callbacks_factory()} if callbacks_factory else {}
+        answer = None
+        yield sse("start", {"query": query})
+        try:
+            async for namespace, update in graph.astream(
+                input={"messages": [("user", query)]},
+                config=config,
+                subgraphs=True,
+            ):
+                for node, value in update.items():
+                    event = {"namespace": list(namespace), "node": node}
+                    # Top-level updates are the workers reporting back to the
+                    # supervisor; their last message is the current answer.
+                    if not namespace and isinstance(value, dict) and value.get("messages"):
+                        answer = value["messages"][-1].content
+                        event["content"] = answer
+                    yield sse("progress", event)
+        except Exception as e:
+            logging.error(f"Chat stream error: {e}")
+            yield sse("error", {"error": str(e)})
+            return
+        yield sse("answer", {"result": answer})
+
+    async def chat(request: Request):
+        body = await request.json()
+        query = body.get("query")
+        if not query:
+            return JSONResponse({"error": "query is required"}, status_code=400)
+        return StreamingResponse(
+            events(query),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    async def metrics_endpoint(request: Request):
+        return JSONResponse(metrics.snapshot())
+
+    async def stats(request: Request):
+        return JSONResponse(cache_stats() if cache_stats else {})
+
+    return Starlette(
+        routes=[
+            Route("/chat", chat, methods=["POST"]),
+            Route("/cache/stats", stats, methods=["GET"]),
+            Route("/metrics", metrics_endpoint, methods=["GET"]),
+        ]
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+    from maxim.logger.langchain import MaximLangchainTracer
+
+    from agent import cache_stats, graph, logger
+
+    uvicorn.run(
+        create_app(
+            graph,
+            lambda: [
+                MaximLangchainTracer(logger=logger, metadata=None),
+                node_metrics_callback(),
+            ],
+            cache_stats,
+        ),
+        port=8000,
+    )
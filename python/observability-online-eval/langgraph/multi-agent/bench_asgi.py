@@ -0,0 +1,101 @@
+"""
+Load test for the streaming /chat endpoint in asgi_app.py.
+
+The graph is replaced by a stub whose supervisor and worker steps sleep like
+LLM calls would, and the app is served by uvicorn on a local port. The test
+reports the time to the first ``progress`` event (the first graph update, as
+opposed to the ``start`` event sent before the graph runs), total latency and
+requests/sec.
+
+    python bench_asgi.py --requests 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import socket
+import statistics
+import time
+from typing import List, Tuple
+
+import httpx
+import uvicorn
+from langchain_core.messages import HumanMessage
+
+from asgi_app import create_app
+
+
+class StubGraph:
+    def __init__(self, step_latency: float) -> None:
+        self.step_latency = step_latency
+
+    async def astream(self, input, config=None, subgraphs=False):
+        await asyncio.sleep(self.step_latency)
+        yield (), {"supervisor": None}
+        await asyncio.sleep(self.step_latency)
+        yield ("rag:1",), {"agent": {"messages": []}}
+        await asyncio.sleep(self.step_latency)
+        yield (), {"rag": {"messages": [HumanMessage(content="stub answer", name="rag")]}}
+        await asyncio.sleep(self.step_latency)
+        yield (), {"supervisor": None}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def one_request(client: httpx.AsyncClient, url: str) -> Tuple[float, float]:
+    start = time.perf_counter()
+    first_progress = None
+    async with client.stream("POST", url, json={"query": "stub"}) as response:
+        async for line in response.aiter_lines():
+            if first_progress is None and line == "event: progress":
+                first_progress = time.perf_counter() - start
+    return first_progress, time.perf_counter() - start
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def main(args) -> None:
+    port = free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(create_app(StubGraph(args.step_latency)), port=port, log_level="warning")
+    )
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    url = f"http://127.0.0.1:{port}/chat"
+    semaphore = asyncio.Semaphore(args.concurrency)
+    limits = httpx.Limits(max_connections=args.concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+
+        async def bounded():
+            async with semaphore:
+                return await one_request(client, url)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(bounded() for _ in range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+    server.should_exit = True
+    await serving
+
+    first = [r[0] * 1000 for r in results]
+    total = [r[1] * 1000 for r in results]
+    print(f"requests={args.requests} concurrency={args.concurrency}")
+    print(f"first progress p50={statistics.median(first):8.2f} ms  p99={percentile(first, 0.99):8.2f} ms")
+    print(f"total          p50={statistics.median(total):8.2f} ms  p99={percentile(total, 0.99):8.2f} ms")
+    print(f"throughput {args.requests / elapsed:.1f} req/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--step-latency", type=float, default=0.2)
+    asyncio.run(main(parser.parse_args()))
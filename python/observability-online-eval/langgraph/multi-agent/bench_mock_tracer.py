@@ -0,0 +1,56 @@
+"""
+Per-callback overhead of MockTracer.
+
+Replays nested chain -> chat model -> tool start/end callbacks with
+pre-generated run ids and reports the cost per event with no sink, with an
+in-memory sink and with the print sink (the tracer's old behaviour) writing
+to /dev/null.
+
+    python bench_mock_tracer.py --runs 100000
+"""
+import argparse
+import contextlib
+import os
+import time
+from uuid import uuid4
+
+from mock_tracer import MockTracer, print_sink
+
+
+def drive(tracer: MockTracer, runs: int) -> float:
+    ids = [(uuid4(), uuid4(), uuid4()) for _ in range(runs)]
+    start = time.perf_counter()
+    for chain_id, llm_id, tool_id in ids:
+        tracer.on_chain_start({}, {}, run_id=chain_id, parent_run_id=None, name="agent")
+        tracer.on_chat_model_start({}, [[]], run_id=llm_id, parent_run_id=chain_id)
+        tracer.on_llm_end(None, run_id=llm_id, parent_run_id=chain_id)
+        tracer.on_tool_start({"name": "nl2sql_tool"}, "", run_id=tool_id, parent_run_id=chain_id)
+        tracer.on_tool_end("", run_id=tool_id, parent_run_id=chain_id)
+        tracer.on_chain_end({}, run_id=chain_id, parent_run_id=None)
+    elapsed = time.perf_counter() - start
+    assert not tracer.containers, "every run should have been removed on end"
+    return elapsed / (runs * 6) * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=100_000)
+    parser.add_argument("--max-finished", type=int, default=1024)
+    args = parser.parse_args()
+
+    events = []
+    sinks = [
+        ("no sink", None),
+        ("list sink", lambda event, container: events.append(event)),
+    ]
+    for name, sink in sinks:
+        tracer = MockTracer(sink=sink, max_finished=args.max_finished)
+        print(f"{name:<11} {drive(tracer, args.runs):8.0f} ns/event  finished={len(tracer.finished)}")
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        per_event = drive(MockTracer(sink=print_sink), args.runs)
+    print(f"{'print sink':<11} {per_event:8.0f} ns/event")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Compare nl2sql tool latency before and after NL2SQLEngine.
+
+Runs against a throwaway SQLite database with a Chinook-like schema and a fake
+LLM, so the numbers only reflect schema reflection, chain construction and
+query execution.
+
+    python bench_nl2sql.py --calls 200 --tables 12
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from operator import itemgetter
+from typing import Callable, List
+
+from langchain.chains import create_sql_query_chain
+from langchain_community.tools.sql_database.tool import QuerySQLDataBaseTool
+from langchain_community.utilities import SQLDatabase
+from langchain_core.language_models.fake import FakeListLLM
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+
+from nl2sql_engine import NL2SQLEngine
+from sql_cleaner import clean_sql_query
+
+RESPONSES = [
+    "SELECT COUNT(*) FROM Table0;",
+    "```sql\nSELECT Name FROM Table1 ORDER BY Name LIMIT 5;\n```",
+    "SQLQuery: SELECT Id, Name FROM Table2 WHERE Id < 10;",
+]
+
+
+def create_database(path: str, tables: int, rows: int) -> None:
+    connection = sqlite3.connect(path)
+    for t in range(tables):
+        connection.execute(
+            f"CREATE TABLE Table{t} (Id INTEGER PRIMARY KEY, Name TEXT, Price REAL, Created TEXT)"
+        )
+        connection.executemany(
+            f"INSERT INTO Table{t} (Name, Price, Created) VALUES (?, ?, ?)",
+            [(f"name-{i}", i * 0.5, "2024-01-01") for i in range(rows)],
+        )
+    connection.commit()
+    connection.close()
+
+
+def legacy_tool(llm, db: SQLDatabase) -> Callable[[str], str]:
+    def run(question: str) -> str:
+        execute_query = QuerySQLDataBaseTool(db=db)
+        write_query = create_sql_query_chain(llm, db)
+        chain = RunnablePassthrough.assign(
+            query=write_query | RunnableLambda(clean_sql_query)
+        ).assign(result=itemgetter("query") | execute_query)
+        return chain.invoke({"question": question})["result"]
+
+    return run
+
+
+def measure(run: Callable[[str], str], calls: int) -> List[float]:
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        run(f"question {i}")
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(name: str, latencies: List[float]) -> None:
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{name:<10} p50={p50:8.3f} ms  p99={p99:8.3f} ms  n={len(latencies)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--tables", type=int, default=11)
+    parser.add_argument("--rows", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        create_database(path, args.tables, args.rows)
+        uri = f"sqlite:///{path}"
+        llm = FakeListLLM(responses=RESPONSES)
+
+        report("before", measure(legacy_tool(llm, SQLDatabase.from_uri(uri)), args.calls))
+        engine = NL2SQLEngine(llm, uri, clean_query=clean_sql_query)
+        report("after", measure(engine.run, args.calls))
+
+
+if __name__ == "__main__":
+    main()
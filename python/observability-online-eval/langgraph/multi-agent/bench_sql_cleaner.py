@@ -0,0 +1,190 @@
+"""
+Micro-benchmark and equivalence check for sql_cleaner.clean_sql_query.
+
+The corpus mixes SQL answers in the shapes gpt-4o returns them for the Chinook
+questions (fenced blocks, "SQLQuery:" prefixes, trailing chatter, backticked
+identifiers) with randomly generated variations of them, and with generated
+write statements. For every sample, normalize_sql must return exactly what the
+original regex pipeline returns. clean_sql_query must then return the same text
+for the SELECTs and reject everything else. Whether a sample is read-only is
+known from how it was generated, not from ensure_read_only.
+
+    python bench_sql_cleaner.py --samples 5000 --seed 7
+"""
+import argparse
+import random
+import re
+import timeit
+from typing import List, Tuple
+
+from sql_cleaner import clean_sql_query, ensure_read_only, normalize_sql
+
+CORPUS = [
+    "SELECT COUNT(*) FROM Artist;",
+    "```sql\nSELECT Name FROM Artist LIMIT 5;\n```",
+    "```SQLQuery\nSELECT \"Name\" FROM \"Track\" ORDER BY \"Milliseconds\" DESC LIMIT 5;\n```",
+    "SQLQuery: SELECT `Name`, `Composer` FROM `Track` WHERE `Composer` IS NOT NULL LIMIT 5;",
+    "SQL Query: SELECT BillingCountry, SUM(Total) AS Revenue FROM Invoice GROUP BY BillingCountry ORDER BY Revenue DESC LIMIT 5;",
+    "SELECT a.Title, COUNT(t.TrackId) AS Tracks\nFROM Album a\nINNER JOIN Track t ON a.AlbumId = t.AlbumId\nGROUP BY a.AlbumId\nHAVING COUNT(t.TrackId) > 20;\n\nThis query returns albums with more than 20 tracks.",
+    "Here is the query:\n```sql\nSELECT e.FirstName, e.LastName, COUNT(c.CustomerId)\nFROM Employee e LEFT JOIN Customer c ON c.SupportRepId = e.EmployeeId\nGROUP BY e.EmployeeId;\n```\nSQLResult:",
+    "select g.Name, avg(t.UnitPrice) from Genre g join Track t on t.GenreId = g.GenreId group by g.Name order by 2 desc limit 3;",
+    "SELECT Name FROM Artist WHERE Name LIKE '%Metal%' UNION SELECT Title FROM Album WHERE Title LIKE '%Metal%';",
+    "MySQL: SELECT `c`.`Country`, COUNT(*) FROM `Customer` `c` GROUP  BY `c`.`Country`;",
+]
+
+TABLES = ["Artist", "Album", "Track", "Invoice", "Customer", "Genre", "Employee"]
+COLUMNS = ["Name", "Title", "Total", "Country", "Composer", "UnitPrice", "`Name`"]
+PREFIXES = ["", "SQLQuery: ", "SQL Query:", "sql: ", "PostgreSQL :  ", "Answer: "]
+FENCES = [("", ""), ("```sql\n", "\n```"), ("```SQL ", " ```"), ("```\n", "\n```")]
+SUFFIXES = ["", "\n", "\n\nThis returns the rows.", " SQLResult: [(1,)]", "\n\nSELECT 2;"]
+CLAUSES = [
+    "",
+    " WHERE {c} IS NOT NULL",
+    " ORDER BY {c} DESC",
+    " GROUP BY {c} HAVING COUNT(*) > 1",
+    " LIMIT 5",
+    " left join {t} x on x.Id = {t}.Id",
+]
+SPACES = [" ", "  ", "\n", "\t", " \n "]
+WRITE_STATEMENTS = [
+    "INSERT INTO {t} ({c}) VALUES ('x')",
+    "insert or replace into {t} values (1, 'x')",
+    "REPLACE INTO {t} ({c}) VALUES ('x')",
+    "UPDATE {t} SET {c} = 'x' WHERE {c} IS NULL",
+    "DELETE FROM {t} WHERE {c} = 'x'",
+    "DROP TABLE {t}",
+    "WITH old AS (VALUES (1)) DELETE FROM {t}",
+    "ALTER TABLE {t} ADD COLUMN Extra TEXT",
+    "PRAGMA writable_schema = 1",
+]
+# Chatter after a write must not contain SELECT, or the old cleaner would
+# extract that instead.
+WRITE_SUFFIXES = ["", "\n", "\n\nThis updates the rows.", " SQLResult: []"]
+
+# Queries ensure_read_only must accept and reject regardless of the corpus.
+READ_ONLY = [
+    "SELECT REPLACE(Name, 'a', 'b') FROM Artist;",
+    "select replace(Title, ' ', '_') as Slug from Album limit 5",
+    "WITH t AS (SELECT Name FROM Track) SELECT REPLACE(Name, 'x', '') FROM t;",
+]
+WRITES = [
+    "REPLACE INTO Artist (ArtistId, Name) VALUES (1, 'x');",
+    "WITH t AS (SELECT 1) REPLACE INTO Artist SELECT * FROM t;",
+    "INSERT OR REPLACE INTO Artist VALUES (1, 'x');",
+    "SELECT 1; DROP TABLE Artist;",
+]
+
+
+def legacy_clean_sql_query(text: str) -> str:
+    block_pattern = r"```(?:sql|SQL|SQLQuery|mysql|postgresql)?\s*(.*?)\s*```"
+    text = re.sub(block_pattern, r"\1", text, flags=re.DOTALL)
+    prefix_pattern = r"^(?:SQL\s*Query|SQLQuery|MySQL|PostgreSQL|SQL)\s*:\s*"
+    text = re.sub(prefix_pattern, "", text, flags=re.IGNORECASE)
+    sql_statement_pattern = r"(SELECT.*?;)"
+    sql_match = re.search(sql_statement_pattern, text, flags=re.IGNORECASE | re.DOTALL)
+    if sql_match:
+        text = sql_match.group(1)
+    text = re.sub(r"`([^`]*)`", r"\1", text)
+    text = re.sub(r"\s+", " ", text)
+    keywords = [
+        "SELECT", "FROM", "WHERE", "GROUP BY", "HAVING", "ORDER BY", "LIMIT",
+        "JOIN", "LEFT JOIN", "RIGHT JOIN", "INNER JOIN", "OUTER JOIN", "UNION",
+        "VALUES", "INSERT", "UPDATE", "DELETE",
+    ]
+    pattern = "|".join(r"\b{}\b".format(k) for k in keywords)
+    text = re.sub(f"({pattern})", r"\n\1", text, flags=re.IGNORECASE)
+    text = text.strip()
+    text = re.sub(r"\n\s*\n", "\n", text)
+    return text
+
+
+def random_sample(rng: random.Random) -> Tuple[str, bool]:
+    """A SELECT answer, and whether its cleaned form should be accepted."""
+    table = rng.choice(TABLES)
+    column = rng.choice(COLUMNS)
+    words = ["SELECT", column, "FROM", table]
+    for clause in rng.sample(CLAUSES, rng.randint(0, 3)):
+        words.append(clause.format(c=column, t=rng.choice(TABLES)).strip())
+    sql = rng.choice(SPACES).join(w for w in words if w)
+    if rng.random() < 0.8:
+        sql += ";"
+    if rng.random() < 0.3:
+        sql = sql.lower()
+    start, end = rng.choice(FENCES)
+    prefix = rng.choice(PREFIXES)
+    sample = prefix + start + sql + end + rng.choice(SUFFIXES)
+    # "Answer:" is not one of the stripped prefixes, so it stays in front of
+    # the query unless a semicolon (of the query or of a trailing SELECT) ends
+    # a statement that gets extracted.
+    return sample, prefix != "Answer: " or ";" in sample
+
+
+def random_write(rng: random.Random) -> Tuple[str, bool]:
+    """A write statement, which must always be rejected."""
+    sql = rng.choice(WRITE_STATEMENTS).format(c=rng.choice(COLUMNS), t=rng.choice(TABLES))
+    sql = rng.choice(SPACES).join(sql.split(" "))
+    if rng.random() < 0.8:
+        sql += ";"
+    start, end = rng.choice(FENCES)
+    return rng.choice(PREFIXES) + start + sql + end + rng.choice(WRITE_SUFFIXES), False
+
+
+def check_equivalence(samples: List[Tuple[str, bool]]) -> Tuple[int, int]:
+    """Return the number of accepted and of rejected samples."""
+    accepted = rejected = 0
+    for sample, read_only in samples:
+        expected = legacy_clean_sql_query(sample)
+        actual = normalize_sql(sample)
+        assert actual == expected, f"mismatch for {sample!r}:\n{actual!r}\n{expected!r}"
+        try:
+            cleaned = clean_sql_query(sample)
+        except ValueError:
+            assert not read_only, f"read-only query rejected: {sample!r}"
+            rejected += 1
+            continue
+        assert read_only, f"query accepted: {sample!r} -> {cleaned!r}"
+        assert cleaned == expected
+        accepted += 1
+    return accepted, rejected
+
+
+def check_read_only() -> None:
+    for sql in READ_ONLY:
+        assert ensure_read_only(sql) == sql, sql
+    for sql in WRITES:
+        try:
+            ensure_read_only(sql)
+        except ValueError:
+            continue
+        raise AssertionError(f"write accepted: {sql!r}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    check_read_only()
+    rng = random.Random(args.seed)
+    samples = [(sample, True) for sample in CORPUS]
+    for _ in range(args.samples):
+        generate = random_write if rng.random() < 0.2 else random_sample
+        samples.append(generate(rng))
+    accepted, rejected = check_equivalence(samples)
+    print(
+        f"normalized outputs identical on {len(samples)} samples, "
+        f"{accepted} accepted, {rejected} rejected"
+    )
+
+    for name, fn in [("legacy", legacy_clean_sql_query), ("compiled", clean_sql_query)]:
+        seconds = min(
+            timeit.repeat(lambda: [fn(s) for s in CORPUS], number=args.repeat, repeat=5)
+        )
+        per_call = seconds / (args.repeat * len(CORPUS)) * 1e6
+        print(f"{name:<9} {per_call:7.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
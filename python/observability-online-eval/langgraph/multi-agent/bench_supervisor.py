@@ -0,0 +1,91 @@
+"""
+End-to-end latency of the supervisor graph in single and fan-out mode.
+
+The supervisor LLM and the worker agents are replaced by stand-ins that sleep
+for a fixed time, so the difference between the modes is only the number of
+sequential round trips. The scripted question needs both the rag and the
+nl2sql worker.
+
+    python bench_supervisor.py --runs 10 --llm-latency 0.4 --worker-latency 1.5
+"""
+import argparse
+import statistics
+import time
+from typing import List
+
+from langchain_core.messages import AIMessage
+
+from supervisor import FanOutRouter, build_graph
+
+NEEDED = ["rag", "nl2sql"]
+
+
+class FakeRouter:
+    def __init__(self, latency: float, fan_out: bool) -> None:
+        self.latency = latency
+        self.fan_out = fan_out
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        time.sleep(self.latency)
+        answered = {getattr(m, "name", None) for m in messages}
+        remaining = [w for w in NEEDED if w not in answered]
+        if self.fan_out:
+            return {"next": remaining or ["FINISH"]}
+        return {"next": remaining[0] if remaining else "FINISH"}
+
+
+class FakeSupervisorLLM:
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.router = None
+
+    def with_structured_output(self, schema):
+        self.router = FakeRouter(self.latency, fan_out=schema is FanOutRouter)
+        return self.router
+
+
+class FakeAgent:
+    def __init__(self, name: str, latency: float) -> None:
+        self.name = name
+        self.latency = latency
+
+    def invoke(self, state):
+        time.sleep(self.latency)
+        return {"messages": [AIMessage(content=f"{self.name} answer")]}
+
+
+def run(mode: str, runs: int, llm_latency: float, worker_latency: float) -> List[float]:
+    llm = FakeSupervisorLLM(llm_latency)
+    agents = {
+        name: FakeAgent(name, worker_latency)
+        for name in ["web_researcher", "rag", "nl2sql"]
+    }
+    graph = build_graph(llm, agents, mode=mode)
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        graph.invoke({"messages": [("user", "Which genre sells best and what does FutureSmart AI offer?")]})
+        latencies.append(time.perf_counter() - start)
+    print(
+        f"{mode:<7} p50={statistics.median(latencies):6.3f} s  "
+        f"max={max(latencies):6.3f} s  supervisor calls/run={llm.router.calls / runs:.1f}"
+    )
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.4)
+    parser.add_argument("--worker-latency", type=float, default=1.5)
+    args = parser.parse_args()
+
+    single = run("single", args.runs, args.llm_latency, args.worker_latency)
+    fan_out = run("fanout", args.runs, args.llm_latency, args.worker_latency)
+    print(f"speedup p50: {statistics.median(single) / statistics.median(fan_out):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
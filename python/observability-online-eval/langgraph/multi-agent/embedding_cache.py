@@ -0,0 +1,58 @@
+import re
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from ttl_cache import TTLCache
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", text.strip().lower())
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Wraps an embedding model with an LRU cache of query embeddings.
+
+    Queries are keyed on their lowercased, whitespace-collapsed text, so
+    repeated questions skip the model entirely. Document embeddings are passed
+    through untouched.
+
+    Args:
+        embeddings: Model used on a cache miss.
+        maxsize: Number of query embeddings kept.
+        ttl: Optional lifetime of a cached embedding in seconds.
+    """
+
+    def __init__(
+        self, embeddings: Embeddings, maxsize: int = 1024, ttl: Optional[float] = None
+    ) -> None:
+        self.embeddings = embeddings
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = normalize_text(text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = normalize_text(text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self.cache.put(key, vector)
+        return vector
+
+    def resize(self, maxsize: int) -> None:
+        self.cache.resize(maxsize)
+
+    def cache_info(self) -> Dict[str, Any]:
+        return self.cache.stats()
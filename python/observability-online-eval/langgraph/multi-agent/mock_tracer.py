@@ -1,24 +1,124 @@
-import uuid
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
 from uuid import UUID, uuid4
 
 from langchain.callbacks.base import BaseCallbackHandler
 
 
-@dataclass
 class Container:
-    type: str
-    id: str
-    name: Optional[str] = None
-    parent: Optional[str] = None
+    """A chain, LLM or tool run seen by the tracer."""
+
+    __slots__ = (
+        "type",
+        "id",
+        "name",
+        "parent",
+        "start",
+        "end",
+        "error",
+        "inputs",
+        "outputs",
+    )
+
+    def __init__(
+        self,
+        type: str,
+        id: UUID,
+        name: Optional[str] = None,
+        parent: Optional[UUID] = None,
+    ) -> None:
+        self.type = type
+        self.id = id
+        self.name = name
+        self.parent = parent
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.error: Optional[str] = None
+        self.inputs: Any = None
+        self.outputs: Any = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end is None else self.end - self.start
+
+    def __repr__(self) -> str:
+        return (
+            f"Container(type={self.type!r}, id='{self.id}', name={self.name!r}, "
+            f"parent={str(self.parent) if self.parent else None!r})"
+        )
+
+
+Sink = Callable[[str, Container], None]
+
+
+def print_sink(event: str, container: Container) -> None:
+    """Sink that prints every event, like the tracer used to."""
+    print(event, container.id, container.parent, container.name)
 
 
 class MockTracer(BaseCallbackHandler):
-    def __init__(self) -> None:
+    """
+    Local tracer that keeps the parent/child structure of a LangGraph run.
+
+    Runs are held in ``containers`` only while they are active and move to the
+    ``finished`` ring buffer when they end, so memory stays bounded in a
+    long-lived server. Every start and end event is handed to ``sink``.
+
+    Args:
+        sink: Called with the event name and the run. ``None`` disables it.
+        max_finished: Number of finished runs kept in the ring buffer.
+        capture_io: Keep the inputs and outputs of every run on its container,
+            e.g. for :class:`replay.RunRecorder`.
+    """
+
+    def __init__(
+        self,
+        sink: Optional[Sink] = None,
+        max_finished: int = 1024,
+        capture_io: bool = False,
+    ) -> None:
         super().__init__()
         self.parent_span = str(uuid4())
-        self.containers: Dict[str, Container] = {}
+        self.sink = sink
+        self.capture_io = capture_io
+        self.containers: Dict[UUID, Container] = {}
+        self.finished: Deque[Container] = deque(maxlen=max_finished)
+
+    def _start(
+        self,
+        type: str,
+        event: str,
+        run_id: UUID,
+        parent_run_id: Optional[UUID],
+        name: Optional[str],
+        inputs: Any = None,
+    ) -> None:
+        container = Container(type, run_id, name, parent_run_id)
+        if self.capture_io:
+            container.inputs = inputs
+        self.containers[run_id] = container
+        if self.sink is not None:
+            self.sink(event, container)
+
+    def _end(
+        self,
+        event: str,
+        run_id: UUID,
+        error: Optional[BaseException] = None,
+        outputs: Any = None,
+    ) -> None:
+        container = self.containers.pop(run_id, None)
+        if container is None:
+            return
+        container.end = time.perf_counter()
+        if self.capture_io:
+            container.outputs = outputs
+        if error is not None:
+            container.error = repr(error)
+        self.finished.append(container)
+        if self.sink is not None:
+            self.sink(event, container)
 
     def on_chain_start(
         self,
@@ -31,17 +131,26 @@ class MockTracer(BaseCallbackHandler):
         metadata: Optional[dict[str, Any]] = None,
         **kwargs: Any
     ) -> Any:
-        tags = tags or []
-        if "langsmith:hidden" in tags:
+        if tags and "langsmith:hidden" in tags:
             return
-        print("on_chain_start", run_id, parent_run_id, kwargs.get("name", None))
-        self.containers[str(run_id)] = Container(
-            type="span",
-            id=str(run_id),
-            name=kwargs.get("name", None),
-            parent=str(parent_run_id) if parent_run_id else None,
+        self._start(
+            "span", "on_chain_start", run_id, parent_run_id, kwargs.get("name"), inputs
         )
 
+    def on_chain_end(
+        self,
+        outputs: dict[str, Any],
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        tags: Optional[list[str]] = None,
+        **kwargs: Any
+    ) -> Any:
+        self._end("on_chain_end", run_id, outputs=outputs)
+
+    def on_chain_error(self, error, *, run_id, parent_run_id=None, **kwargs):
+        self._end("on_chain_error", run_id, error)
+
     def on_llm_start(
         self,
         serialized: dict[str, Any],
@@ -53,14 +162,8 @@ class MockTracer(BaseCallbackHandler):
         metadata: Optional[dict[str, Any]] = None,
         **kwargs: Any
     ) -> Any:
-        return super().on_llm_start(
-            serialized,
-            prompts,
-            run_id=run_id,
-            parent_run_id=parent_run_id,
-            tags=tags,
-            metadata=metadata,
-            **kwargs
+        self._start(
+            "generation", "on_llm_start", run_id, parent_run_id, kwargs.get("name"), prompts
         )
 
     def on_chat_model_start(
@@ -74,27 +177,20 @@ class MockTracer(BaseCallbackHandler):
         metadata=None,
         **kwargs
     ):
-        print("on_chat_model_start", run_id, parent_run_id)
-        print("adding generation to", self.containers[str(parent_run_id)])
+        self._start(
+            "generation",
+            "on_chat_model_start",
+            run_id,
+            parent_run_id,
+            kwargs.get("name"),
+            messages,
+        )
 
     def on_llm_error(self, error, *, run_id, parent_run_id=None, **kwargs):
-        pass
+        self._end("on_llm_error", run_id, error)
 
     def on_llm_end(self, response, *, run_id, parent_run_id=None, **kwargs):
-        print("on_llm_end", run_id, parent_run_id)
-
-    def on_chain_end(
-        self,
-        outputs: dict[str, Any],
-        *,
-        run_id: UUID,
-        parent_run_id: Optional[UUID] = None,
-        tags: Optional[list[str]] = None,
-        **kwargs: Any
-    ) -> Any:
-        if "langsmith:hidden" in tags:
-            return
-        print("on_chain_end", run_id, parent_run_id, kwargs.get("name", None))
+        self._end("on_llm_end", run_id, outputs=response)
 
     def on_tool_start(
         self,
@@ -108,8 +204,23 @@ class MockTracer(BaseCallbackHandler):
         inputs: Optional[dict[str, Any]] = None,
         **kwargs: Any
     ) -> Any:
-        print("on_tool_start", str(run_id), str(parent_run_id))
-        print("adding tool to", self.containers[str(parent_run_id)])
+        name = serialized.get("name") if serialized else kwargs.get("name")
+        self._start(
+            "tool",
+            "on_tool_start",
+            run_id,
+            parent_run_id,
+            name,
+            inputs if inputs is not None else input_str,
+        )
 
     def on_tool_end(self, output: Any, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> Any:
-        print("on_tool_end", str(run_id), str(parent_run_id))
\ No newline at end of file
+        self._end("on_tool_end", run_id, outputs=output)
+
+    def on_tool_error(self, error, *, run_id, parent_run_id=None, **kwargs):
+        self._end("on_tool_error", run_id, error)
+
+    def children(self, run_id: UUID) -> List[Container]:
+        """Active and finished runs whose parent is ``run_id``."""
+        runs = list(self.containers.values()) + list(self.finished)
+        return [c for c in runs if c.parent == run_id]
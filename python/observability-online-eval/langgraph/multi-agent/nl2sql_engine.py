@@ -0,0 +1,127 @@
+import hashlib
+import threading
+import time
+from operator import itemgetter
+from typing import Any, Callable, Dict, Optional
+
+from langchain.chains import create_sql_query_chain
+from langchain_community.tools.sql_database.tool import QuerySQLDataBaseTool
+from langchain_community.utilities import SQLDatabase
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.runnables import Runnable, RunnableLambda, RunnablePassthrough
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.engine import Engine
+
+from sql_cache import SQLResultCache
+
+
+class NL2SQLEngine:
+    """
+    Long-lived NL2SQL pipeline shared by every call of the nl2sql tool.
+
+    The schema of the database is reflected once and handed to ``SQLDatabase``
+    as ``custom_table_info``, so the SQL chain no longer re-reflects tables and
+    re-samples rows on every question. The compiled chain is cached and is only
+    rebuilt when the schema version of the database changes.
+
+    Args:
+        llm: Model used to write the SQL query.
+        db_uri: SQLAlchemy URI of the database, e.g. ``sqlite:///Chinook.db``.
+        clean_query: Post-processing applied to the raw LLM output.
+        check_interval: Minimum number of seconds between two schema checks.
+        cache: Optional cache of generated SQL and results, keyed on the
+            question and the schema fingerprint.
+    """
+
+    def __init__(
+        self,
+        llm: BaseLanguageModel,
+        db_uri: str,
+        clean_query: Callable[[str], str],
+        check_interval: float = 5.0,
+        cache: Optional[SQLResultCache] = None,
+    ) -> None:
+        self.llm = llm
+        self.cache = cache
+        self.clean_query = clean_query
+        self.check_interval = check_interval
+        self.engine: Engine = create_engine(db_uri)
+        self._lock = threading.Lock()
+        self._schema_version: Any = None
+        self._last_check = 0.0
+        self._db: Optional[SQLDatabase] = None
+        self._chain: Optional[Runnable] = None
+        self._fingerprint = ""
+
+    @property
+    def db(self) -> SQLDatabase:
+        self._ensure_fresh()
+        return self._db
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of the table info the SQL chain is prompted with."""
+        self._ensure_fresh()
+        return self._fingerprint
+
+    def _read_schema_version(self) -> Any:
+        if self.engine.dialect.name == "sqlite":
+            with self.engine.connect() as connection:
+                return connection.exec_driver_sql("PRAGMA schema_version").scalar()
+        return tuple(sorted(inspect(self.engine).get_table_names()))
+
+    def _build(self, schema_version: Any) -> None:
+        reflected = SQLDatabase(self.engine)
+        table_info: Dict[str, str] = {
+            name: reflected.get_table_info(table_names=[name])
+            for name in reflected.get_usable_table_names()
+        }
+        db = SQLDatabase(self.engine, custom_table_info=table_info)
+        write_query = create_sql_query_chain(self.llm, db)
+        execute_query = QuerySQLDataBaseTool(db=db)
+
+        self._chain = RunnablePassthrough.assign(
+            query=write_query | RunnableLambda(self.clean_query)
+        ).assign(result=itemgetter("query") | execute_query)
+        self._db = db
+        self._fingerprint = hashlib.sha256(
+            "\n\n".join(sorted(table_info.values())).encode("utf-8")
+        ).hexdigest()
+        self._schema_version = schema_version
+
+    def _ensure_fresh(self) -> Runnable:
+        chain = self._chain
+        if chain is not None and time.monotonic() - self._last_check < self.check_interval:
+            return chain
+        with self._lock:
+            now = time.monotonic()
+            if self._chain is not None and now - self._last_check < self.check_interval:
+                return self._chain
+            schema_version = self._read_schema_version()
+            if self._chain is None or schema_version != self._schema_version:
+                self._build(schema_version)
+            self._last_check = now
+            return self._chain
+
+    def refresh(self) -> None:
+        """Reflect the schema again and rebuild the chain right away."""
+        with self._lock:
+            self._build(self._read_schema_version())
+            self._last_check = time.monotonic()
+
+    def invoke(self, question: str) -> Dict[str, Any]:
+        """Run the chain and return ``question``, ``query`` and ``result``."""
+        chain = self._ensure_fresh()
+        fingerprint = self._fingerprint
+        if self.cache is not None:
+            cached = self.cache.get(question, fingerprint)
+            if cached is not None:
+                return {"question": question, "query": cached[0], "result": cached[1]}
+
+        response = chain.invoke({"question": question})
+        if self.cache is not None and not str(response["result"]).startswith("Error:"):
+            self.cache.put(question, fingerprint, response["query"], response["result"])
+        return response
+
+    def run(self, question: str) -> str:
+        return self.invoke(question)["result"]
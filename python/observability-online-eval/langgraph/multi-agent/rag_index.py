@@ -0,0 +1,315 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_chroma import Chroma
+from langchain_community.document_loaders import Docx2txtLoader, PyPDFLoader
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import TextSplitter
+
+LOADERS = {".pdf": PyPDFLoader, ".docx": Docx2txtLoader}
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_file(file_path: str) -> List[Document]:
+    loader = LOADERS[os.path.splitext(file_path)[1].lower()]
+    return loader(file_path).load()
+
+
+class LazyEmbeddings(Embeddings):
+    """
+    Embeddings whose model is only created on first use.
+
+    Parsing workers are forked when a sync finds files to embed, and this
+    keeps the model (and e.g. torch's threads and locks) out of the process
+    they are forked from, so they cannot inherit it in a deadlocked state.
+
+    Args:
+        factory: Creates the wrapped model, e.g. ``SentenceTransformerEmbeddings``.
+    """
+
+    def __init__(self, factory: Callable[[], Embeddings]) -> None:
+        self.factory = factory
+        self._embeddings: Optional[Embeddings] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Embeddings:
+        with self._lock:
+            if self._embeddings is None:
+                self._embeddings = self.factory()
+            return self._embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.load().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.load().embed_query(text)
+
+
+def start_pool(workers: Optional[int] = None) -> Optional[ProcessPoolExecutor]:
+    """
+    Fork the parsing workers right away and return the pool.
+
+    Workers forked after an embedding model was loaded would inherit its
+    threads and locks in whatever state they were in and can deadlock, so
+    load the model lazily (see :class:`LazyEmbeddings`). Returns ``None`` when
+    files should be parsed in the calling process (``workers=0`` or no fork).
+    """
+    # Workers are forked: spawned workers would re-import the calling script,
+    # and agent.py builds the index at import time.
+    if workers == 0 or "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    pool = ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count() or 1,
+        mp_context=multiprocessing.get_context("fork"),
+    )
+    # A forking pool starts all of its workers on the first submit.
+    pool.submit(os.getpid).result()
+    return pool
+
+
+def _iter_pool(
+    pool: ProcessPoolExecutor, file_paths: List[str], max_in_flight: int
+) -> Iterator[Tuple[str, List[Document]]]:
+    remaining = iter(file_paths)
+    pending = {}
+    for file_path in remaining:
+        pending[pool.submit(load_file, file_path)] = file_path
+        if len(pending) >= max_in_flight:
+            break
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield pending.pop(future), future.result()
+            next_path = next(remaining, None)
+            if next_path is not None:
+                pending[pool.submit(load_file, next_path)] = next_path
+
+
+def iter_loaded(
+    file_paths: Iterable[str],
+    workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+) -> Iterator[Tuple[str, List[Document]]]:
+    """
+    Parse files in a process pool and yield ``(path, documents)`` as they finish.
+
+    At most ``max_in_flight`` files are submitted at a time, so only that many
+    parsed files can be waiting in memory regardless of the corpus size. The
+    pool is only started when there are at least two files, and is shut down
+    at the end. ``workers=0`` parses in the calling process.
+    """
+    file_paths = list(file_paths)
+    max_in_flight = max_in_flight or (workers or os.cpu_count() or 1) * 2
+    pool = start_pool(workers) if len(file_paths) > 1 else None
+    if pool is None:
+        for file_path in file_paths:
+            yield file_path, load_file(file_path)
+        return
+    with pool:
+        yield from _iter_pool(pool, file_paths, max_in_flight)
+
+
+def peak_rss_mb(children: bool = False) -> float:
+    """
+    Peak resident memory of this process, or with ``children=True`` of the
+    largest of its terminated child processes, such as the parsing workers.
+    """
+    import resource
+
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class IncrementalIndexer:
+    """
+    Keeps a Chroma collection in sync with a folder of PDF and DOCX files.
+
+    A JSON manifest records, for every indexed file, its size, mtime, content
+    hash and the ids of its chunks. On ``sync`` only added or changed files are
+    split and embedded again, and the chunks of changed or removed files are
+    deleted. Chunk ids are derived from the file path and content hash, so an
+    interrupted sync can simply be run again.
+
+    Args:
+        vectorstore: Collection to keep in sync.
+        folder_path: Folder containing the source documents.
+        text_splitter: Splitter applied to every loaded document.
+        manifest_path: Location of the JSON manifest.
+        workers: Size of the process pool used to parse files. ``None`` uses
+            one process per CPU, ``0`` parses in the calling process.
+        batch_size: Number of chunks embedded and written per Chroma call.
+
+    The parsing pool is only started by a sync that has files to embed, and
+    shut down before it returns. Give ``vectorstore`` a
+    :class:`LazyEmbeddings` model so that the pool is forked before the model
+    is loaded.
+    """
+
+    def __init__(
+        self,
+        vectorstore: Chroma,
+        folder_path: str,
+        text_splitter: TextSplitter,
+        manifest_path: str,
+        workers: Optional[int] = None,
+        batch_size: int = 256,
+    ) -> None:
+        self.vectorstore = vectorstore
+        self.folder_path = folder_path
+        self.text_splitter = text_splitter
+        self.manifest_path = manifest_path
+        self.workers = workers
+        self.batch_size = batch_size
+
+    def _read_manifest(self) -> Dict[str, dict]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest: Dict[str, dict]) -> None:
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _scan(self, manifest: Dict[str, dict]) -> Dict[str, dict]:
+        """Stat every supported file and hash only those whose stat changed."""
+        files = {}
+        for filename in sorted(os.listdir(self.folder_path)):
+            if os.path.splitext(filename)[1].lower() not in LOADERS:
+                continue
+            stat = os.stat(os.path.join(self.folder_path, filename))
+            entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            known = manifest.get(filename)
+            if (
+                known is not None
+                and known["size"] == entry["size"]
+                and known["mtime_ns"] == entry["mtime_ns"]
+            ):
+                entry["hash"] = known["hash"]
+            else:
+                entry["hash"] = file_hash(os.path.join(self.folder_path, filename))
+            files[filename] = entry
+        return files
+
+    def _chunk_ids(self, filename: str, content_hash: str, count: int) -> List[str]:
+        return [f"{filename}:{content_hash[:16]}:{i}" for i in range(count)]
+
+    def _ingest(self, names: List[str], files: Dict[str, dict]) -> Tuple[int, int]:
+        """Parse, split and embed ``names``, streaming chunks in batches."""
+        documents = chunks = 0
+        batch: List[Document] = []
+        batch_ids: List[str] = []
+        paths = {os.path.join(self.folder_path, name): name for name in names}
+        for file_path, loaded in iter_loaded(paths, workers=self.workers):
+            name = paths[file_path]
+            splits = self.text_splitter.split_documents(loaded)
+            ids = self._chunk_ids(name, files[name]["hash"], len(splits))
+            files[name]["ids"] = ids
+            documents += 1
+            chunks += len(splits)
+            batch.extend(splits)
+            batch_ids.extend(ids)
+            while len(batch) >= self.batch_size:
+                self.vectorstore.add_documents(
+                    batch[: self.batch_size], ids=batch_ids[: self.batch_size]
+                )
+                del batch[: self.batch_size], batch_ids[: self.batch_size]
+        if batch:
+            self.vectorstore.add_documents(batch, ids=batch_ids)
+        return documents, chunks
+
+    def sync(self) -> Dict[str, float]:
+        start = time.perf_counter()
+        manifest = self._read_manifest()
+        if not manifest and self.vectorstore.get(limit=1)["ids"]:
+            # Collection was built before the manifest existed, so its chunk
+            # ids are unknown: start over once.
+            self.vectorstore.reset_collection()
+
+        files = self._scan(manifest)
+        removed = [name for name in manifest if name not in files]
+        changed = [
+            name
+            for name, entry in files.items()
+            if name in manifest and manifest[name]["hash"] != entry["hash"]
+        ]
+        added = [name for name in files if name not in manifest]
+
+        stale_ids = [i for name in removed + changed for i in manifest[name]["ids"]]
+        if stale_ids:
+            self.vectorstore.delete(ids=stale_ids)
+
+        documents, chunks = self._ingest(changed + added, files)
+
+        for name, entry in files.items():
+            if "ids" not in entry:
+                entry["ids"] = manifest[name]["ids"]
+        self._write_manifest(files)
+        seconds = time.perf_counter() - start
+        return {
+            "added": len(added),
+            "changed": len(changed),
+            "removed": len(removed),
+            "unchanged": len(files) - len(added) - len(changed),
+            "chunks": chunks,
+            "seconds": seconds,
+            "docs_per_sec": documents / seconds if seconds else 0.0,
+            "chunks_per_sec": chunks / seconds if seconds else 0.0,
+            "peak_rss_mb": peak_rss_mb(),
+            # The pool is shut down by now, so its workers are counted.
+            "peak_worker_rss_mb": peak_rss_mb(children=True),
+        }
+
+
+if __name__ == "__main__":
+    from langchain_community.embeddings.sentence_transformer import (
+        SentenceTransformerEmbeddings,
+    )
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    parser = argparse.ArgumentParser(description="Sync a folder into a Chroma index.")
+    parser.add_argument("folder")
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    vectorstore = Chroma(
+        collection_name="my_collection",
+        # MiniLM and torch are only loaded once the parsing workers are forked.
+        embedding_function=LazyEmbeddings(
+            lambda: SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
+        ),
+        persist_directory=args.persist_directory,
+    )
+    indexer = IncrementalIndexer(
+        vectorstore,
+        args.folder,
+        RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, length_function=len),
+        manifest_path=os.path.join(args.persist_directory, "manifest.json"),
+        workers=args.workers,
+        batch_size=args.batch_size,
+    )
+    summary = indexer.sync()
+    print(json.dumps(summary, indent=2))
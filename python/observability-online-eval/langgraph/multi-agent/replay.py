@@ -0,0 +1,187 @@
+"""
+Record LangGraph runs with MockTracer and replay them offline.
+
+Recording appends one JSON line per finished chain, chat model and tool run
+with its duration. Only chat model and tool runs keep their output, under a
+hash of the messages sent to the model or of the tool arguments: that is all
+replay needs, and chain inputs would repeat the whole message history at
+every step. Replaying builds the multi-agent graph with a chat model and
+tools that answer from the recording and streams the question through it
+with the app's own call, so the graph can be benchmarked and
+regression-tested without network access or model cost.
+
+    python replay.py run.jsonl "How many albums does AC/DC have?" --repeat 20
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import BaseTool
+
+from mock_tracer import Container
+from supervisor import build_graph, create_agent, members, stream_run
+
+
+def message_key(messages: Sequence[BaseMessage]) -> str:
+    """
+    Hash of a prompt that ignores message ids, which differ between runs.
+    """
+    parts = [
+        [
+            m.type,
+            m.content,
+            getattr(m, "name", None),
+            getattr(m, "tool_call_id", None),
+            [[c["name"], c["args"]] for c in getattr(m, "tool_calls", None) or []],
+        ]
+        for m in messages
+    ]
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def tool_key(name: str, inputs: Any) -> str:
+    raw = json.dumps([name, inputs], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class RunRecorder:
+    """
+    MockTracer sink that appends every finished run to a JSON lines file.
+
+    Chain runs are recorded with their timing only.
+
+    Use it with ``MockTracer(sink=RunRecorder(path), capture_io=True)``.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+
+    def __call__(self, event: str, container: Container) -> None:
+        if not event.endswith(("_end", "_error")):
+            return
+        record = {
+            "type": container.type,
+            "id": str(container.id),
+            "parent": str(container.parent) if container.parent else None,
+            "name": container.name,
+            "ms": round(container.duration * 1000, 3),
+            "error": container.error,
+        }
+        if container.type == "generation" and container.outputs is not None:
+            record["key"] = message_key(container.inputs[0])
+            record["out"] = message_to_dict(container.outputs.generations[0][0].message)
+        elif container.type == "tool" and container.error is None:
+            record["key"] = tool_key(container.name, container.inputs)
+            record["out"] = getattr(container.outputs, "content", container.outputs)
+        line = json.dumps(record, separators=(",", ":"), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class Recording:
+    """Recorded model and tool outputs, grouped by prompt or tool-call key."""
+
+    def __init__(self, path: str) -> None:
+        self.outputs: Dict[str, Deque[Any]] = defaultdict(deque)
+        self.tool_names: List[str] = []
+        self._lock = threading.Lock()
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if "key" not in record:
+                    continue
+                self.outputs[record["key"]].append(record["out"])
+                if record["type"] == "tool" and record["name"] not in self.tool_names:
+                    self.tool_names.append(record["name"])
+
+    def pop(self, key: str) -> Any:
+        """Return the next output recorded for ``key``, repeating the last one."""
+        with self._lock:
+            outputs = self.outputs.get(key)
+            if not outputs:
+                raise KeyError(f"No recorded output for key {key}")
+            return outputs.popleft() if len(outputs) > 1 else outputs[0]
+
+
+class ReplayChatModel(BaseChatModel):
+    recording: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = messages_from_dict([self.recording.pop(message_key(messages))])[0]
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def with_structured_output(self, schema, **kwargs):
+        # Recorded structured output is either a forced tool call or JSON
+        # content, depending on the method the original model used.
+        def parse(message):
+            if message.tool_calls:
+                return message.tool_calls[0]["args"]
+            return json.loads(message.content)
+
+        return self | RunnableLambda(parse)
+
+
+class ReplayTool(BaseTool):
+    recording: Any
+    description: str = "Returns the recorded output of this tool."
+
+    def _run(self, *args: Any, **kwargs: Any) -> Any:
+        return self.recording.pop(tool_key(self.name, kwargs or (args[0] if args else "")))
+
+
+def build_replay_graph(path: str, mode: str = "single"):
+    recording = Recording(path)
+    llm = ReplayChatModel(recording=recording)
+    tools = [ReplayTool(name=name, recording=recording) for name in recording.tool_names]
+    agents = {name: create_agent(llm, tools) for name in members}
+    return build_graph(llm, agents, mode=mode)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded multi-agent run.")
+    parser.add_argument("recording")
+    parser.add_argument("question")
+    parser.add_argument("--mode", default="single")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    latencies = []
+    for _ in range(args.repeat):
+        graph = build_replay_graph(args.recording, mode=args.mode)
+        start = time.perf_counter()
+        answer = None
+        for namespace, update in stream_run(graph, args.question):
+            for node_update in update.values():
+                if not namespace and node_update and node_update.get("messages"):
+                    answer = node_update["messages"][-1].content
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(answer)
+    print(f"graph overhead: min={min(latencies):.2f} ms  max={max(latencies):.2f} ms")
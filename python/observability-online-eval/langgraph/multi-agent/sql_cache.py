@@ -0,0 +1,127 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from ttl_cache import TTLCache
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?.!;]+$")
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    question = _WHITESPACE.sub(" ", question.strip().lower())
+    return _TRAILING_PUNCTUATION.sub("", question)
+
+
+class SQLResultCache:
+    """
+    Two-level cache from a question to the SQL generated for it and its result.
+
+    Entries are keyed on the normalized question and the schema fingerprint of
+    the database. The first level is an in-process LRU with TTL; the optional
+    second level is a SQLite table that survives restarts. Both levels are
+    dropped as soon as the modification time of ``watch_path`` changes.
+
+    Args:
+        watch_path: Database file whose mtime invalidates the cache.
+        maxsize: Capacity of the in-process level.
+        ttl: Lifetime of an entry in seconds, applied to both levels.
+        disk_path: Location of the on-disk level. ``None`` disables it.
+    """
+
+    def __init__(
+        self,
+        watch_path: str,
+        maxsize: int = 512,
+        ttl: Optional[float] = 3600.0,
+        disk_path: Optional[str] = None,
+    ) -> None:
+        self.watch_path = watch_path
+        self.ttl = ttl
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.disk_hits = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._mtime = self._read_mtime()
+        self._disk: Optional[sqlite3.Connection] = None
+        if disk_path:
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS nl2sql_cache ("
+                "key TEXT PRIMARY KEY, sql TEXT, result TEXT, "
+                "created REAL, db_mtime INTEGER)"
+            )
+            self._disk.execute(
+                "DELETE FROM nl2sql_cache WHERE db_mtime != ?", (self._mtime,)
+            )
+            self._disk.commit()
+
+    def _read_mtime(self) -> int:
+        try:
+            return os.stat(self.watch_path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def _check_mtime(self) -> None:
+        mtime = self._read_mtime()
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            self.memory.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM nl2sql_cache")
+                self._disk.commit()
+            self._mtime = mtime
+            self.invalidations += 1
+
+    @staticmethod
+    def make_key(question: str, fingerprint: str) -> str:
+        raw = f"{fingerprint}\0{normalize_question(question)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, question: str, fingerprint: str) -> Optional[Tuple[str, Any]]:
+        """Return ``(sql, result)`` for the question, or ``None`` on a miss."""
+        self._check_mtime()
+        key = self.make_key(question, fingerprint)
+        entry = self.memory.get(key)
+        if entry is not None or self._disk is None:
+            return entry
+        with self._lock:
+            row = self._disk.execute(
+                "SELECT sql, result, created FROM nl2sql_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or (self.ttl is not None and time.time() - row[2] > self.ttl):
+            return None
+        self.disk_hits += 1
+        entry = (row[0], row[1])
+        self.memory.put(key, entry)
+        return entry
+
+    def put(self, question: str, fingerprint: str, sql: str, result: Any) -> None:
+        key = self.make_key(question, fingerprint)
+        self.memory.put(key, (sql, result))
+        if self._disk is None:
+            return
+        with self._lock:
+            self._disk.execute(
+                "INSERT OR REPLACE INTO nl2sql_cache VALUES (?, ?, ?, ?, ?)",
+                (key, sql, str(result), time.time(), self._mtime),
+            )
+            self._disk.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.memory.stats()
+        stats["hits"] += self.disk_hits
+        stats["misses"] -= self.disk_hits
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / total if total else 0.0
+        stats["disk_hits"] = self.disk_hits
+        stats["invalidations"] = self.invalidations
+        return stats
@@ -0,0 +1,160 @@
+import re
+
+# Every pattern is compiled once at import time instead of on each call.
+_CODE_BLOCK = re.compile(
+    r"```(?:sql|SQL|SQLQuery|mysql|postgresql)?\s*(.*?)\s*```", re.DOTALL
+)
+_PREFIX = re.compile(
+    r"^(?:SQL\s*Query|SQLQuery|MySQL|PostgreSQL|SQL)\s*:\s*", re.IGNORECASE
+)
+_FIRST_STATEMENT = re.compile(r"(SELECT.*?;)", re.IGNORECASE | re.DOTALL)
+_BACKTICKS = re.compile(r"`([^`]*)`")
+_WHITESPACE = re.compile(r"\s+")
+
+KEYWORDS = [
+    "SELECT",
+    "FROM",
+    "WHERE",
+    "GROUP BY",
+    "HAVING",
+    "ORDER BY",
+    "LIMIT",
+    "JOIN",
+    "LEFT JOIN",
+    "RIGHT JOIN",
+    "INNER JOIN",
+    "OUTER JOIN",
+    "UNION",
+    "VALUES",
+    "INSERT",
+    "UPDATE",
+    "DELETE",
+]
+
+# The lookahead on the possible first letters lets the engine skip most word
+# boundaries without trying all seventeen alternatives.
+_KEYWORDS = re.compile(
+    r"\b(?=[{}])({})\b".format(
+        "".join(sorted({k[0] for k in KEYWORDS})), "|".join(KEYWORDS)
+    ),
+    re.IGNORECASE,
+)
+
+# String literals, quoted identifiers and comments are matched as a whole so
+# that words inside them are never mistaken for keywords.
+_TOKENS = re.compile(
+    r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|\[[^\]]*\]|--[^\n]*|/\*.*?\*/|(;)|([A-Za-z_]\w*)""",
+    re.DOTALL,
+)
+_WRITE_KEYWORDS = frozenset(
+    [
+        "ALTER",
+        "ATTACH",
+        "CREATE",
+        "DELETE",
+        "DETACH",
+        "DROP",
+        "GRANT",
+        "INSERT",
+        "MERGE",
+        "PRAGMA",
+        "REINDEX",
+        "REVOKE",
+        "TRUNCATE",
+        "UPDATE",
+        "VACUUM",
+    ]
+)
+# REPLACE is also a string function, so it only counts as a write when it is
+# followed by INTO (INSERT already covers INSERT OR REPLACE).
+_AMBIGUOUS_KEYWORDS = _WRITE_KEYWORDS | {"REPLACE"}
+_WORDS = re.compile(r"\w+")
+_FIRST_WORD = re.compile(r"\s*([A-Za-z_]\w*)")
+
+
+# normalize_sql keeps the original passes, only compiled, rather than a single
+# tokenizing scan: its output must match the old cleaner byte for byte, and
+# that cleaner rewrites keywords and whitespace inside string literals too,
+# which a tokenizer would leave alone. ensure_read_only is the one pass that
+# does tokenize, and the common case never gets that far.
+
+
+def normalize_sql(text: str) -> str:
+    """
+    Clean SQL query by removing code block syntax, various SQL tags, backticks,
+    prefixes, and unnecessary whitespace while preserving the core SQL query.
+
+    Args:
+        text (str): Raw SQL query text that may contain code blocks, tags, and backticks
+
+    Returns:
+        str: Cleaned SQL query
+    """
+    if "```" in text:
+        text = _CODE_BLOCK.sub(r"\1", text)
+    text = _PREFIX.sub("", text)
+    sql_match = _FIRST_STATEMENT.search(text)
+    if sql_match:
+        text = sql_match.group(1)
+    if "`" in text:
+        text = _BACKTICKS.sub(r"\1", text)
+    text = _WHITESPACE.sub(" ", text)
+    # After whitespace normalization every inserted newline is directly
+    # followed by a keyword, so no blank lines can appear and stripping the
+    # ends is the only cleanup left.
+    return _KEYWORDS.sub(r"\n\1", text).strip()
+
+
+def ensure_read_only(sql: str) -> str:
+    """
+    Check that ``sql`` is a single read-only SELECT statement.
+
+    Args:
+        sql (str): Cleaned SQL query
+
+    Returns:
+        str: The unchanged query
+
+    Raises:
+        ValueError: If the query is empty, writes to the database or contains
+            more than one statement.
+    """
+    # Fast path: no write keyword anywhere and at most a trailing semicolon
+    # means only the leading word has to be looked at.
+    first = _FIRST_WORD.match(sql)
+    if (
+        first is not None
+        and first.group(1).upper() in ("SELECT", "WITH")
+        and sql.find(";") in (-1, len(sql.rstrip()) - 1)
+        and _AMBIGUOUS_KEYWORDS.isdisjoint(_WORDS.findall(sql.upper()))
+    ):
+        return sql
+
+    first_word = None
+    previous = None
+    terminated = False
+    for match in _TOKENS.finditer(sql):
+        semicolon, word = match.group(1), match.group(2)
+        if semicolon is None and word is None:
+            continue
+        if terminated:
+            raise ValueError("Only a single SQL statement is allowed")
+        if semicolon is not None:
+            terminated = True
+            continue
+        word = word.upper()
+        if first_word is None:
+            first_word = word
+        if word in _WRITE_KEYWORDS:
+            raise ValueError(f"Only read-only SELECT queries are allowed, found {word}")
+        if word == "INTO" and previous == "REPLACE":
+            raise ValueError("Only read-only SELECT queries are allowed, found REPLACE")
+        previous = word
+    if first_word not in ("SELECT", "WITH"):
+        raise ValueError("Only read-only SELECT queries are allowed")
+    return sql
+
+
+def clean_sql_query(text: str) -> str:
+    """Normalize the raw LLM output and make sure it is a read-only SELECT."""
+    return ensure_read_only(normalize_sql(text))
@@ -0,0 +1,174 @@
+from typing import Dict, Iterator, List, Literal, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage
+from langgraph.graph import END, START, MessagesState, StateGraph
+from langgraph.graph.graph import CompiledGraph
+from langgraph.graph.message import add_messages
+from langgraph.prebuilt.tool_node import ToolNode, tools_condition
+from langgraph.types import Command
+from langgraph.utils.runnable import RunnableCallable
+from typing_extensions import Annotated, TypedDict
+
+members = ["web_researcher", "rag", "nl2sql"]
+# Our supervisor is an LLM node. It just picks the next agent to process
+# and decides when the work is completed
+options = members + ["FINISH"]
+
+system_prompt = (
+    "You are a supervisor tasked with managing a conversation between the"
+    f" following workers: {members}. Given the following user request,"
+    " respond with the worker to act next. Each worker will perform a"
+    " task and respond with their results and status. When finished,"
+    " respond with FINISH."
+)
+
+fan_out_system_prompt = (
+    "You are a supervisor tasked with managing a conversation between the"
+    f" following workers: {members}. Given the following user request,"
+    " respond with every worker that should act next. The workers you pick"
+    " run in parallel on the same conversation, so only pick several when"
+    " their tasks do not depend on each other. Each worker will perform a"
+    " task and respond with their results and status. When finished,"
+    " respond with FINISH."
+)
+
+
+class Router(TypedDict):
+    """Worker to route to next. If no workers needed, route to FINISH."""
+
+    next: Literal["web_researcher", "rag", "nl2sql", "FINISH"]
+
+
+class FanOutRouter(TypedDict):
+    """Workers to route to next, run in parallel. If no workers needed, route to FINISH."""
+
+    next: List[Literal["web_researcher", "rag", "nl2sql", "FINISH"]]
+
+
+class AgentState(TypedDict):
+    """The state of the agent."""
+
+    messages: Annotated[Sequence[BaseMessage], add_messages]
+
+
+def create_agent(llm, tools):
+    llm_with_tools = llm.bind_tools(tools)
+
+    def chatbot(state: AgentState):
+        return {"messages": [llm_with_tools.invoke(state["messages"])]}
+
+    async def achatbot(state: AgentState):
+        return {"messages": [await llm_with_tools.ainvoke(state["messages"])]}
+
+    graph_builder = StateGraph(AgentState)
+    # astream/ainvoke await the model call instead of parking a thread on it.
+    # Like plain function nodes, the wrapper is not traced as a run of its own.
+    graph_builder.add_node("agent", RunnableCallable(chatbot, achatbot, trace=False))
+
+    tool_node = ToolNode(tools=tools)
+    graph_builder.add_node("tools", tool_node)
+
+    graph_builder.add_conditional_edges(
+        "agent",
+        tools_condition,
+    )
+    # Any time a tool is called, we return to the chatbot to decide the next step
+    graph_builder.add_edge("tools", "agent")
+    graph_builder.set_entry_point("agent")
+    graph = graph_builder.compile()
+    return graph
+
+
+def create_supervisor_node(llm, mode: str = "single"):
+    """
+    Build the supervisor node.
+
+    In ``single`` mode the supervisor routes to one worker per LLM call. In
+    ``fanout`` mode it may return several workers; LangGraph runs them as
+    parallel branches of the same step and merges their messages before the
+    supervisor is called again.
+    """
+    if mode not in ("single", "fanout"):
+        raise ValueError(f"Unsupported supervisor mode: {mode}")
+    fan_out = mode == "fanout"
+    router = llm.with_structured_output(FanOutRouter if fan_out else Router)
+    prompt = fan_out_system_prompt if fan_out else system_prompt
+
+    def route(response) -> Command[Literal["web_researcher", "rag", "nl2sql", "__end__"]]:
+        if not fan_out:
+            goto = response["next"]
+            # print(f"Next Worker: {goto}")
+            if goto == "FINISH":
+                goto = END
+            return Command(goto=goto)
+
+        # FINISH only ends the run when no worker was picked alongside it.
+        workers = [w for w in dict.fromkeys(response["next"]) if w in members]
+        if not workers:
+            return Command(goto=END)
+        return Command(goto=workers if len(workers) > 1 else workers[0])
+
+    def supervisor_node(state: MessagesState):
+        messages = [
+            {"role": "system", "content": prompt},
+        ] + state["messages"]
+        return route(router.invoke(messages))
+
+    async def asupervisor_node(state: MessagesState):
+        messages = [
+            {"role": "system", "content": prompt},
+        ] + state["messages"]
+        return route(await router.ainvoke(messages))
+
+    return RunnableCallable(supervisor_node, asupervisor_node, trace=False)
+
+
+def create_worker_node(name: str, agent: CompiledGraph):
+    def report(result) -> Command[Literal["supervisor"]]:
+        return Command(
+            update={
+                "messages": [
+                    HumanMessage(content=result["messages"][-1].content, name=name)
+                ]
+            },
+            goto="supervisor",
+        )
+
+    def worker_node(state: MessagesState):
+        return report(agent.invoke(state))
+
+    async def aworker_node(state: MessagesState):
+        return report(await agent.ainvoke(state))
+
+    return RunnableCallable(worker_node, aworker_node, trace=False)
+
+
+def build_graph(
+    llm, agents: Dict[str, CompiledGraph], mode: str = "single"
+) -> CompiledGraph:
+    """Wire the supervisor and one node per worker agent into a graph."""
+    builder = StateGraph(MessagesState)
+    builder.add_edge(START, "supervisor")
+    # The nodes route with Command; destinations keep the edges in the
+    # drawn graph now that they are not plain annotated functions.
+    builder.add_node(
+        "supervisor",
+        create_supervisor_node(llm, mode),
+        destinations=tuple(members) + (END,),
+    )
+    for name in members:
+        builder.add_node(
+            name, create_worker_node(name, agents[name]), destinations=("supervisor",)
+        )
+    return builder.compile()
+
+
+def stream_run(graph: CompiledGraph, user_message: str, config=None) -> Iterator:
+    """Stream one question through ``graph`` with the updates of every subgraph."""
+    return graph.stream(
+        input={
+            "messages": [("user", user_message)],
+        },
+        config=config,
+        subgraphs=True,
+    )
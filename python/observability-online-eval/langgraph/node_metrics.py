@@ -0,0 +1,266 @@
+"""
+In-process latency histograms and token counts per LangGraph node and model.
+
+Add ``node_metrics_callback()`` to the callbacks of a graph run, next to
+``langchain_callback()``, and serve ``metrics.snapshot()`` as JSON. Node runs
+are recognised by the ``langgraph_node`` metadata LangGraph attaches to every
+run inside a node: the run named after that node is the node itself.
+"""
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+SUB_BUCKET_BITS = 7
+SUB_BUCKET_HALF = 1 << (SUB_BUCKET_BITS - 1)
+# Enough buckets for values up to 2**44 microseconds (about 200 days).
+MAX_SHIFT = 44 - SUB_BUCKET_BITS + 1
+BUCKETS = (MAX_SHIFT + 1) * SUB_BUCKET_HALF + (1 << SUB_BUCKET_BITS)
+
+
+def bucket_index(value: int) -> int:
+    """Log-linear bucket of ``value``: exact below 128, then 64 buckets per power of two."""
+    if value < 1 << SUB_BUCKET_BITS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return shift * SUB_BUCKET_HALF + (value >> shift)
+
+
+def bucket_value(index: int) -> int:
+    """Lowest value that falls in bucket ``index``."""
+    if index < 1 << SUB_BUCKET_BITS:
+        return index
+    shift = index // SUB_BUCKET_HALF - 1
+    return (index - shift * SUB_BUCKET_HALF) << shift
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of microsecond latencies.
+
+    Recording is one bucket increment. Percentiles are exact below 128 us and
+    within 1/64 of the true value above it.
+    """
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self) -> None:
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value: int) -> None:
+        index = bucket_index(value)
+        if index >= BUCKETS:
+            index = BUCKETS - 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> int:
+        if not self.count:
+            return 0
+        rank = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bucket_value(index), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count / 1000, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(0.5) / 1000,
+            "p90_ms": self.percentile(0.9) / 1000,
+            "p99_ms": self.percentile(0.99) / 1000,
+            "max_ms": self.max / 1000,
+        }
+
+
+class ModelStats:
+    __slots__ = ("latency", "prompt_tokens", "completion_tokens", "errors")
+
+    def __init__(self) -> None:
+        self.latency = LatencyHistogram()
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.errors = 0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "latency": self.latency.summary(),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "errors": self.errors,
+        }
+
+
+class NodeMetrics:
+    """Histograms per node and per model, shared by every request."""
+
+    def __init__(self) -> None:
+        self.nodes: Dict[str, LatencyHistogram] = {}
+        self.node_errors: Dict[str, int] = {}
+        self.models: Dict[str, ModelStats] = {}
+        self._lock = threading.Lock()
+
+    def record_node(self, node: str, micros: int, error: bool = False) -> None:
+        with self._lock:
+            histogram = self.nodes.get(node)
+            if histogram is None:
+                histogram = self.nodes[node] = LatencyHistogram()
+            histogram.record(micros)
+            if error:
+                self.node_errors[node] = self.node_errors.get(node, 0) + 1
+
+    def record_model(
+        self, model: str, micros: int, prompt_tokens: int, completion_tokens: int, error: bool
+    ) -> None:
+        with self._lock:
+            stats = self.models.get(model)
+            if stats is None:
+                stats = self.models[model] = ModelStats()
+            stats.latency.record(micros)
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+            if error:
+                stats.errors += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            nodes = {}
+            for node, histogram in self.nodes.items():
+                nodes[node] = histogram.summary()
+                nodes[node]["errors"] = self.node_errors.get(node, 0)
+            return {
+                "nodes": nodes,
+                "models": {model: s.summary() for model, s in self.models.items()},
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.nodes.clear()
+            self.node_errors.clear()
+            self.models.clear()
+
+
+def _token_usage(response: Any) -> Tuple[int, int]:
+    usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+    if usage:
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    prompt = completion = 0
+    for generations in getattr(response, "generations", None) or []:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if metadata:
+                prompt += metadata.get("input_tokens", 0)
+                completion += metadata.get("output_tokens", 0)
+    return prompt, completion
+
+
+class NodeMetricsHandler(BaseCallbackHandler):
+    """
+    Callback handler that times LangGraph nodes and model calls into ``metrics``.
+
+    One handler can be shared by all requests: in-flight runs are keyed by
+    their unique run id.
+    """
+
+    def __init__(self, metrics: NodeMetrics) -> None:
+        super().__init__()
+        self.metrics = metrics
+        self._nodes: Dict[UUID, Tuple[str, int]] = {}
+        self._models: Dict[UUID, Tuple[str, int]] = {}
+
+    def on_chain_start(
+        self,
+        serialized: Optional[Dict[str, Any]],
+        inputs: Any,
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        if metadata:
+            node = metadata.get("langgraph_node")
+            if node is not None and kwargs.get("name") == node:
+                self._nodes[run_id] = (node, time.perf_counter_ns())
+
+    def _end_node(self, run_id: UUID, error: bool) -> None:
+        started = self._nodes.pop(run_id, None)
+        if started is not None:
+            node, start = started
+            self.metrics.record_node(node, (time.perf_counter_ns() - start) // 1000, error)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_node(run_id, False)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_node(run_id, True)
+
+    def _start_model(
+        self,
+        serialized: Optional[Dict[str, Any]],
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]],
+        invocation_params: Optional[Dict[str, Any]],
+    ) -> None:
+        model = (metadata or {}).get("ls_model_name")
+        if model is None and invocation_params:
+            model = invocation_params.get("model_name") or invocation_params.get("model")
+        if model is None:
+            model = (serialized or {}).get("name", "unknown")
+        self._models[run_id] = (model, time.perf_counter_ns())
+
+    def on_llm_start(
+        self,
+        serialized: Optional[Dict[str, Any]],
+        prompts: List[str],
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start_model(serialized, run_id, metadata, kwargs.get("invocation_params"))
+
+    def on_chat_model_start(
+        self,
+        serialized: Optional[Dict[str, Any]],
+        messages: Any,
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start_model(serialized, run_id, metadata, kwargs.get("invocation_params"))
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        started = self._models.pop(run_id, None)
+        if started is not None:
+            model, start = started
+            prompt, completion = _token_usage(response)
+            self.metrics.record_model(
+                model, (time.perf_counter_ns() - start) // 1000, prompt, completion, False
+            )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        started = self._models.pop(run_id, None)
+        if started is not None:
+            model, start = started
+            self.metrics.record_model(model, (time.perf_counter_ns() - start) // 1000, 0, 0, True)
+
+
+metrics = NodeMetrics()
+_handler = NodeMetricsHandler(metrics)
+
+
+def node_metrics_callback() -> NodeMetricsHandler:
+    """The process-wide handler recording into ``metrics``."""
+    return _handler
@@ -0,0 +1,167 @@
+"""
+Chunks/sec of the notebook's one-chunk-per-call embedding against EmbeddingPipeline.
+
+Starts a local OpenAI-compatible /v1/embeddings server that sleeps for a fixed
+round trip plus a per-input cost, returns deterministic vectors and answers
+429 (with Retry-After) when more than ``--server-concurrency`` requests are
+in flight. With ``--drop-every N`` it also closes every Nth connection without
+answering, which the pipeline has to retry as a connection error. Both paths use the real ``openai`` client pointed at it; the
+pipeline writes to an in-memory stand-in for the Mongo collection.
+
+    python bench_embedding_pipeline.py --chunks 2000 --batch-size 128 --concurrency 4
+"""
+import argparse
+import hashlib
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from openai import OpenAI
+
+from embedding_pipeline import EmbeddingPipeline
+
+
+class FakeEmbeddingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self, round_trip: float, per_input: float, max_in_flight: int, dim: int, drop_every: int = 0
+    ) -> None:
+        super().__init__(("127.0.0.1", 0), FakeEmbeddingHandler)
+        self.round_trip = round_trip
+        self.per_input = per_input
+        self.max_in_flight = max_in_flight
+        self.dim = dim
+        self.drop_every = drop_every
+        self.requests = 0
+        self.dropped = 0
+        self.in_flight = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+
+class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: dict, headers: dict = None) -> None:
+        raw = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_POST(self):
+        server = self.server
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.requests += 1
+            drop = server.drop_every and server.requests % server.drop_every == 0
+            if drop:
+                server.dropped += 1
+        if drop:
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+        with server.lock:
+            if server.in_flight >= server.max_in_flight:
+                server.rejected += 1
+                busy = True
+            else:
+                server.in_flight += 1
+                busy = False
+        if busy:
+            self._send(
+                429,
+                {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                {"Retry-After": "0.05"},
+            )
+            return
+        try:
+            inputs = payload["input"]
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            time.sleep(server.round_trip + server.per_input * len(inputs))
+            data = []
+            for i, text in enumerate(inputs):
+                seed = hashlib.sha256(text.encode("utf-8")).digest()
+                vector = [seed[j % len(seed)] / 255 for j in range(server.dim)]
+                data.append({"object": "embedding", "index": i, "embedding": vector})
+            self._send(
+                200,
+                {
+                    "object": "list",
+                    "data": data,
+                    "model": payload["model"],
+                    "usage": {"prompt_tokens": 0, "total_tokens": 0},
+                },
+            )
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+class ListCollection:
+    def __init__(self) -> None:
+        self.documents = []
+
+    def insert_many(self, documents, ordered=True):
+        self.documents.extend(documents)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests-per-minute", type=float, default=3000)
+    parser.add_argument("--round-trip", type=float, default=0.03)
+    parser.add_argument("--per-input", type=float, default=0.0002)
+    parser.add_argument("--server-concurrency", type=int, default=3)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--drop-every", type=int, default=0, help="close every Nth connection")
+    parser.add_argument("--legacy-chunks", type=int, default=200, help="chunks for the slow path")
+    args = parser.parse_args()
+
+    server = FakeEmbeddingServer(
+        args.round_trip, args.per_input, args.server_concurrency, args.dim, args.drop_every
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    chunks = [f"chunk {i} of the book " * 10 for i in range(args.chunks)]
+
+    # The notebook's embed_chunks: one request per chunk, one after another.
+    # The notebook's client keeps the SDK's retries, which cover dropped connections.
+    client = OpenAI(api_key="fake", base_url=base_url)
+    legacy = chunks[: args.legacy_chunks]
+    start = time.perf_counter()
+    expected = [
+        client.embeddings.create(model="text-embedding-ada-002", input=[text]).data[0].embedding
+        for text in legacy
+    ]
+    elapsed = time.perf_counter() - start
+    print(f"legacy    {len(legacy) / elapsed:8.1f} chunks/s  ({len(legacy)} chunks)")
+
+    pipeline = EmbeddingPipeline(
+        OpenAI(api_key="fake", base_url=base_url, max_retries=0),
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        requests_per_minute=args.requests_per_minute,
+        base_delay=0.05,
+    )
+    collection = ListCollection()
+    stats = pipeline.store(collection, chunks, insert_batch_size=1000, progress=False)
+    print(
+        f"pipeline  {stats['chunks_per_sec']:8.1f} chunks/s  ({stats['chunks']} chunks, "
+        f"{stats['requests']} requests, {stats['retries']} retries, 429s={server.rejected}, dropped={server.dropped})"
+    )
+    assert [d["embedding"] for d in collection.documents[: len(legacy)]] == expected
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
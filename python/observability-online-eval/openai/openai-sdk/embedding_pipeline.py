@@ -0,0 +1,182 @@
+"""
+Bulk embedding of text chunks with the OpenAI embeddings API.
+
+Chunks are sent as batched ``input`` lists, several batches run in parallel
+under a requests-per-minute limit, rate-limited (429) and server-error
+responses are retried with exponential backoff, and documents are written to
+MongoDB with ``insert_many`` in bounded batches, so memory stays flat however
+large the corpus is.
+
+Create the client with ``max_retries=0`` so retries are not stacked on top of
+the SDK's own:
+
+    client = OpenAI(api_key=openAI_key, max_retries=0)
+    pipeline = EmbeddingPipeline(client)
+    pipeline.store(collection, chunks)
+
+If a batch still fails after its retries, ``store`` raises
+:class:`StoreError`. Its ``inserted`` count says how many leading chunks were
+already written, so the run can resume with ``chunks[error.inserted:]``.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Sequence
+
+import openai
+
+# Connection errors and timeouts are retried too: with ``max_retries=0`` the
+# SDK no longer retries them itself.
+RETRIED_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+)
+
+
+class StoreError(RuntimeError):
+    """A failed ``store``, after the first ``inserted`` chunks were written."""
+
+    def __init__(self, inserted: int, cause: Exception) -> None:
+        super().__init__(f"Embedding failed after {inserted} chunks were stored: {cause}")
+        self.inserted = inserted
+
+
+class RateLimiter:
+    """Spaces calls evenly so at most ``requests_per_minute`` start per minute."""
+
+    def __init__(self, requests_per_minute: float) -> None:
+        self.interval = 60.0 / requests_per_minute
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class EmbeddingPipeline:
+    """
+    Batched, concurrent and rate-limited embeddings.
+
+    Args:
+        client: ``openai.OpenAI`` client, preferably with ``max_retries=0``.
+        model: Embedding model.
+        batch_size: Chunks per embeddings request (the API accepts up to 2048).
+        concurrency: Requests in flight at the same time.
+        requests_per_minute: Request rate limit across all threads.
+        max_retries: Retries of a batch after a 429 or 5xx response, a
+            connection error or a timeout.
+        base_delay: First backoff delay in seconds, doubled on every retry.
+    """
+
+    def __init__(
+        self,
+        client: openai.OpenAI,
+        model: str = "text-embedding-ada-002",
+        batch_size: int = 256,
+        concurrency: int = 4,
+        requests_per_minute: float = 3000,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+    ) -> None:
+        self.client = client
+        self.model = model
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.limiter = RateLimiter(requests_per_minute)
+        self.requests = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def _retry_delay(self, error: openai.APIError, attempt: int) -> float:
+        retry_after = None
+        # Connection errors and timeouts have no response to read it from.
+        if getattr(error, "response", None) is not None:
+            retry_after = error.response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.base_delay * 2**attempt * (0.5 + random.random() / 2)
+
+    def _embed_batch(self, texts: Sequence[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            with self._lock:
+                self.requests += 1
+            try:
+                response = self.client.embeddings.create(model=self.model, input=list(texts))
+            except RETRIED_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self._retry_delay(e, attempt))
+                attempt += 1
+                continue
+            return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        """Embeddings of ``texts``, in order."""
+        batches = [texts[i : i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1 or self.concurrency <= 1:
+            results = [self._embed_batch(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                results = list(pool.map(self._embed_batch, batches))
+        return [vector for batch in results for vector in batch]
+
+    def embed_chunks(self, chunks: Sequence[str]) -> List[Dict[str, Any]]:
+        """Documents with the text and embedding of every chunk."""
+        return [
+            {"text": text, "embedding": vector}
+            for text, vector in zip(chunks, self.embed(chunks))
+        ]
+
+    def store(
+        self,
+        collection,
+        chunks: Sequence[str],
+        insert_batch_size: int = 1000,
+        progress: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Embed ``chunks`` and insert them into ``collection``, one window of
+        ``insert_batch_size`` chunks at a time.
+
+        Returns the number of chunks, the time taken and chunks/sec.
+
+        Raises:
+            StoreError: If a window fails; the windows before it stay inserted
+                and ``inserted`` counts their chunks.
+        """
+        start = time.perf_counter()
+        inserted = 0
+        for i in range(0, len(chunks), insert_batch_size):
+            try:
+                documents = self.embed_chunks(chunks[i : i + insert_batch_size])
+                collection.insert_many(documents, ordered=False)
+            except Exception as e:
+                raise StoreError(inserted, e) from e
+            inserted += len(documents)
+            if progress:
+                print(f"{inserted}/{len(chunks)} chunks stored")
+        seconds = time.perf_counter() - start
+        return {
+            "chunks": inserted,
+            "seconds": round(seconds, 3),
+            "chunks_per_sec": inserted / seconds if seconds else 0.0,
+            "requests": self.requests,
+            "retries": self.retries,
+        }